@@ -0,0 +1,56 @@
+"""
+Cold-start cost of importing src.ai.
+
+    python -m benchmarks.bench_import_time --runs 5
+
+Each run is a fresh interpreter; the slowest imports come from -X importtime.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_once(module: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=ROOT, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def slowest_imports(module: str, top: int):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        if "." not in name:  # Only top-level packages
+            packages[name] = max(packages.get(name, 0), int(cumulative_us))
+    return sorted(((us, name) for name, us in packages.items()), reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="src.ai")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    baseline = [import_once("sys") for _ in range(args.runs)]
+    timings = [import_once(args.module) for _ in range(args.runs)]
+    print(f"interpreter start: {statistics.median(baseline) * 1e3:8.1f} ms (median of {args.runs})")
+    print(f"import {args.module}: {statistics.median(timings) * 1e3:8.1f} ms (median of {args.runs})")
+    print("slowest top-level imports (cumulative):")
+    for cumulative_us, name in slowest_imports(args.module, args.top):
+        print(f"  {cumulative_us / 1e3:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Cost of building the request body on each turn of a long conversation.
+
+    python -m benchmarks.bench_message_buffer --turns 200 --tool-output 20000
+
+"full re-encode" serializes the whole history every turn, as the SDK does
+with a plain message list; "message buffer" encodes each message once and
+joins the stored segments.
+"""
+import argparse
+import json
+import time
+
+from src.utils.message_buffer import MessageBuffer
+
+FIELDS = {"model": "gpt-4o", "temperature": 0.5, "max_tokens": 1000}
+
+
+def turn(index: int, tool_output: int):
+    return [
+        {"role": "user", "content": [{"type": "text", "text": f"Revisa el archivo {index}"}]},
+        {"role": "assistant", "content": [{"type": "text", "text": ""}], "tool_calls": [{
+            "id": f"call_{index}", "type": "function",
+            "function": {"name": "read_file", "arguments": json.dumps({"path": f"src/{index}.py"})},
+        }]},
+        {"role": "tool", "tool_call_id": f"call_{index}",
+         "content": [{"type": "text", "text": "línea de código ñ\n" * (tool_output // 18)}]},
+    ]
+
+
+def run(turns: int, tool_output: int):
+    history, buffer = [], MessageBuffer()
+    full = incremental = 0.0
+    for index in range(turns):
+        messages = turn(index, tool_output)
+
+        start = time.perf_counter()
+        history.extend(messages)
+        json.dumps({**FIELDS, "messages": history}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        full += time.perf_counter() - start
+
+        start = time.perf_counter()
+        buffer.extend(messages)
+        buffer.request_body(**FIELDS)
+        incremental += time.perf_counter() - start
+
+    print(f"{turns} turns, ~{tool_output} chars of tool output per turn")
+    print(f"full re-encode   total={full * 1e3:9.2f} ms  per turn={full / turns * 1e3:7.3f} ms")
+    print(f"message buffer   total={incremental * 1e3:9.2f} ms  per turn={incremental / turns * 1e3:7.3f} ms")
+    print(f"speedup: {full / incremental:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--tool-output", type=int, default=20000)
+    args = parser.parse_args()
+    run(args.turns, args.tool_output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Per-request overhead of OpenAIRouterProvider with and without a pooled session.
+
+    python -m benchmarks.bench_openrouter_pool --requests 500
+
+"fresh session" reproduces the previous behaviour (one aiohttp.ClientSession
+per call); "pooled" goes through the provider, which reuses its connector.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+
+from benchmarks.stub_server import start_stub_server, server_url
+from src.ai import OpenAIRouterProvider
+
+
+async def fresh_session_request(url: str, data: dict) -> str:
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, json=data) as response:
+            response.raise_for_status()
+            json_response = await response.json()
+            return json_response["choices"][0]["message"]["content"]
+
+
+async def measure(label: str, call, requests: int):
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await call()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"{label:<15} mean={statistics.mean(timings) * 1e3:7.3f} ms  "
+          f"p50={timings[len(timings) // 2] * 1e3:7.3f} ms  "
+          f"p95={timings[int(len(timings) * 0.95)] * 1e3:7.3f} ms")
+    return statistics.mean(timings)
+
+
+async def run(requests: int):
+    runner = await start_stub_server()
+    url = server_url(runner) + "/chat/completions"
+    data = {"model": "stub-model", "messages": [{"role": "user", "content": "hola"}]}
+    try:
+        fresh = await measure("fresh session", lambda: fresh_session_request(url, data), requests)
+        async with OpenAIRouterProvider("stub-model", "test-key", "", "", api_url=url) as provider:
+            pooled = await measure("pooled", lambda: provider.complete("hola"), requests)
+        print(f"overhead saved per request: {(fresh - pooled) * 1e3:.3f} ms ({fresh / pooled:.2f}x)")
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Burst of parallel sessions against a stub that enforces a request quota.
+
+    python -m benchmarks.bench_rate_limit --sessions 60 --quota 20
+
+"no limiter" is the previous behaviour (only the SDK's own retries);
+"rate limited" shares one RateLimiter across the sessions, as
+ProviderFactory does for providers created with the same API key.
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.stub_server import start_stub_server, server_url
+from src.ai import ProviderFactory
+
+
+async def burst(label: str, url: str, sessions: int, rate_limit=None):
+    providers = [
+        ProviderFactory.create_provider("openai", "stub-model", "test-key", base_url=url, rate_limit=rate_limit)
+        for _ in range(sessions)
+    ]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(p.ask("hola") for p in providers), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    failed = sum(isinstance(r, Exception) for r in results)
+    await asyncio.gather(*(p.close() for p in providers))
+    print(f"{label:<13} ok={sessions - failed:3d}  failed={failed:3d}  elapsed={elapsed:6.2f} s  "
+          f"throughput={(sessions - failed) / elapsed:6.2f} req/s")
+
+
+async def run(sessions: int, quota: int):
+    runner = await start_stub_server(rate_limit=quota, rate_window=1.0)
+    stats = runner.app["stats"]
+    url = server_url(runner)
+    try:
+        print(f"stub quota: {quota} req/s, {sessions} sessions")
+        await burst("no limiter", url, sessions)
+        print(f"              server: served={stats['served']} throttled={stats['throttled']}")
+        await asyncio.sleep(1.0)  # Let the stub's window empty
+        stats.update(served=0, throttled=0)
+        await burst("rate limited", url, sessions,
+                    rate_limit={"requests_per_minute": quota * 60, "request_burst": quota})
+        print(f"              server: served={stats['served']} throttled={stats['throttled']}")
+    finally:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=60)
+    parser.add_argument("--quota", type=int, default=20, help="Requests per second the stub accepts.")
+    args = parser.parse_args()
+    asyncio.run(run(args.sessions, args.quota))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Load test of the provider layer against the local stub, at increasing concurrency.
+
+    python -m benchmarks.load_test --requests 400 --concurrency 1 4 16 64
+    python -m benchmarks.load_test --scenarios openai-tools --latency 0.05 --json results.json
+
+The stub runs in its own process so that "cpu/req" is the CPU spent by the
+agent layer alone (this process's CPU time divided by the requests made).
+Scenarios:
+    openai         OpenAIClient (base_url) complete() on forks of one provider
+    openai-stream  same, consuming a stream
+    openai-tools   one round of tool calls per request, then the answer
+    openrouter     OpenAIRouterProvider complete()
+    factory        a provider built with ProviderFactory for every request
+"""
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+
+from src.ai import OpenAIClient, OpenAIRouterProvider, ProviderFactory
+
+SCENARIOS = ["openai", "openai-stream", "openai-tools", "openrouter", "factory"]
+
+
+async def lookup(key: str) -> str:
+    """
+    Returns a fixed value for a key.
+
+    Args:
+        key: Any string.
+    """
+    return f"valor de {key}"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_stub(port: int, args) -> subprocess.Popen:
+    process = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.stub_server", "--port", str(port),
+        "--latency", str(args.latency), "--chunk-delay", str(args.chunk_delay),
+        "--words-per-chunk", str(args.words_per_chunk), "--tool-rounds", "1",
+        "--error-rate", str(args.error_rate), "--seed", str(args.seed),
+    ])
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("El servidor stub no arrancó")
+
+
+def make_request(scenario: str, base_url: str, shared):
+    """Returns an async callable performing one request of the scenario."""
+    if scenario == "factory":
+        async def request(prompt):
+            provider = ProviderFactory.create_provider("openai", "stub-model", "test-key", base_url=base_url)
+            try:
+                return await provider.ask(prompt)
+            finally:
+                await provider.close()
+        return request
+    if scenario == "openai-stream":
+        async def request(prompt):
+            return "".join([chunk async for chunk in shared.fork().ask_stream(prompt)])
+        return request
+
+    async def request(prompt):
+        return await shared.fork().ask(prompt)
+    return request
+
+
+def shared_provider(scenario: str, base_url: str):
+    if scenario == "openrouter":
+        return OpenAIRouterProvider("stub-model", "test-key", "", "", api_url=base_url + "/chat/completions")
+    if scenario == "factory":
+        return None
+    provider = OpenAIClient("stub-model", "test-key", base_url=base_url)
+    if scenario == "openai-tools":
+        provider.set_tools([lookup])
+    return provider
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else float("nan")
+
+
+async def run_level(request, requests: int, concurrency: int):
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                await request(f"prompt {i}")
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    cpu, wall = time.process_time(), time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "rps": requests / wall,
+        "p50_ms": percentile(latencies, 0.50) * 1e3,
+        "p95_ms": percentile(latencies, 0.95) * 1e3,
+        "p99_ms": percentile(latencies, 0.99) * 1e3,
+        "cpu_ms_per_request": cpu / requests * 1e3,
+    }
+
+
+async def run(args, base_url: str):
+    results = {}
+    print(f"{'scenario':<14}{'conc':>5}{'rps':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'cpu/req ms':>12}{'errors':>8}")
+    for scenario in args.scenarios:
+        shared = shared_provider(scenario, base_url)
+        request = make_request(scenario, base_url, shared)
+        await run_level(request, min(20, args.requests), 4)  # Warm-up: connections, imports
+        results[scenario] = []
+        for concurrency in args.concurrency:
+            row = await run_level(request, args.requests, concurrency)
+            results[scenario].append(row)
+            print(f"{scenario:<14}{concurrency:>5}{row['rps']:>10.1f}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}"
+                  f"{row['p99_ms']:>9.2f}{row['cpu_ms_per_request']:>12.3f}{row['errors']:>8}")
+        if shared is not None:
+            await shared.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=400, help="Requests per concurrency level.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Stub latency before responding (s).")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Stub delay between stream chunks (s).")
+    parser.add_argument("--words-per-chunk", type=int, default=1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    port = free_port()
+    stub = start_stub(port, args)
+    try:
+        results = asyncio.run(run(args, f"http://127.0.0.1:{port}/v1"))
+    finally:
+        stub.terminate()
+        stub.wait()
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"options": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Local OpenAI-compatible stand-in used by the benchmarks.
+
+Run it standalone with:
+    python -m benchmarks.stub_server --port 8765
+
+Responses are deterministic: the same options and the same sequence of
+requests always produce the same replies, tool calls and errors.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+DEFAULT_REPLY = "Respuesta de prueba del servidor local."
+
+
+def _usage(text: str) -> dict:
+    return {"prompt_tokens": 10, "completion_tokens": len(text.split()), "total_tokens": 10 + len(text.split())}
+
+
+def _completion(model: str, text: str, tool_calls: Optional[List[dict]] = None) -> dict:
+    message = {"role": "assistant", "content": text}
+    if tool_calls:
+        message["tool_calls"] = tool_calls
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": message,
+            "finish_reason": "tool_calls" if tool_calls else "stop",
+        }],
+        "usage": _usage(text),
+    }
+
+
+def _chunk(model: str, delta: dict, finish_reason=None) -> bytes:
+    payload = {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(payload)}\n\n".encode("utf-8")
+
+
+def _sample_value(schema: Dict[str, Any]) -> Any:
+    """Deterministic value that satisfies a (simple) JSON schema."""
+    if "enum" in schema:
+        return schema["enum"][0]
+    return {"string": "stub", "integer": 1, "number": 1.0, "boolean": True,
+            "array": [], "object": {}}.get(schema.get("type"), "stub")
+
+
+def _tool_calls(tools: List[dict], round_index: int) -> List[dict]:
+    """One call to the first tool of the request, with its required arguments filled in."""
+    function = tools[0].get("function", {})
+    parameters = function.get("parameters", {})
+    properties = parameters.get("properties", {})
+    arguments = {name: _sample_value(properties.get(name, {})) for name in parameters.get("required", [])}
+    return [{
+        "id": f"call_stub_{round_index}",
+        "type": "function",
+        "function": {"name": function.get("name", ""), "arguments": json.dumps(arguments)},
+    }]
+
+
+def create_app(latency: float = 0.0, reply: str = DEFAULT_REPLY, rate_limit: int = 0,
+               rate_window: float = 1.0, chunk_delay: float = 0.0, words_per_chunk: int = 1,
+               tool_rounds: int = 0, error_rate: float = 0.0, error_status: int = 500,
+               seed: int = 0) -> web.Application:
+    """
+    Builds the aiohttp application serving /v1/chat/completions.
+
+    latency: seconds before the first byte of every response.
+    chunk_delay / words_per_chunk: streaming cadence.
+    tool_rounds: when the request offers tools, answer with that many rounds
+        of tool calls (to the first tool) before the final text.
+    error_rate / error_status: fraction of requests failing with that status,
+        drawn from a generator seeded with `seed`.
+    rate_limit: requests beyond rate_limit per rate_window seconds get a 429
+        with Retry-After, like a provider enforcing its quota.
+
+    app["stats"] counts served, throttled and failed requests.
+    """
+    accepted = deque()  # Arrival times of the requests inside the current window
+    stats = {"served": 0, "throttled": 0, "failed": 0}
+    errors = random.Random(seed)
+
+    def throttle() -> web.Response:
+        wait = accepted[0] + rate_window - time.monotonic()
+        stats["throttled"] += 1
+        return web.json_response(
+            {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+            status=429,
+            headers={"Retry-After": str(math.ceil(wait)), "retry-after-ms": str(int(wait * 1000))},
+        )
+
+    async def stream_response(request: web.Request, model: str, tool_calls: Optional[List[dict]]):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await response.write(_chunk(model, {"role": "assistant", "content": ""}))
+        if tool_calls:
+            for index, call in enumerate(tool_calls):
+                arguments = call["function"]["arguments"]
+                half = len(arguments) // 2  # Arguments arrive in fragments, as with real models
+                await response.write(_chunk(model, {"tool_calls": [{
+                    "index": index, "id": call["id"], "type": "function",
+                    "function": {"name": call["function"]["name"], "arguments": arguments[:half]},
+                }]}))
+                await response.write(_chunk(model, {"tool_calls": [{
+                    "index": index, "function": {"arguments": arguments[half:]},
+                }]}))
+            await response.write(_chunk(model, {}, finish_reason="tool_calls"))
+        else:
+            words = reply.split(" ")
+            for start in range(0, len(words), words_per_chunk):
+                if chunk_delay:
+                    await asyncio.sleep(chunk_delay)
+                text = " ".join(words[start:start + words_per_chunk]) + " "
+                await response.write(_chunk(model, {"content": text}))
+            await response.write(_chunk(model, {}, finish_reason="stop"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def chat_completions(request: web.Request) -> web.StreamResponse:
+        if rate_limit:
+            now = time.monotonic()
+            while accepted and accepted[0] <= now - rate_window:
+                accepted.popleft()
+            if len(accepted) >= rate_limit:
+                return throttle()
+            accepted.append(now)
+        body = await request.json()
+        if error_rate and errors.random() < error_rate:
+            stats["failed"] += 1
+            return web.json_response({"error": {"message": "Stub failure", "type": "server_error"}},
+                                     status=error_status)
+        stats["served"] += 1
+        model = body.get("model", "stub-model")
+        if latency:
+            await asyncio.sleep(latency)
+
+        tool_calls = None
+        tools = body.get("tools") or []
+        if tools and tool_rounds:
+            # Rounds already answered in this conversation = tool results sent back
+            answered = sum(1 for message in body.get("messages", []) if message.get("role") == "tool")
+            if answered < tool_rounds:
+                tool_calls = _tool_calls(tools, answered)
+
+        if body.get("stream"):
+            return await stream_response(request, model, tool_calls)
+        return web.json_response(_completion(model, "" if tool_calls else reply, tool_calls))
+
+    app = web.Application()
+    app["stats"] = stats
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    app.router.add_post("/api/v1/chat/completions", chat_completions)
+    return app
+
+
+async def start_stub_server(host: str = "127.0.0.1", port: int = 0, **options) -> web.AppRunner:
+    """Starts the stub in the running loop and returns its runner (call runner.cleanup() to stop)."""
+    runner = web.AppRunner(create_app(**options))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    return runner
+
+
+def server_url(runner: web.AppRunner) -> str:
+    """Base URL (ending in /v1) of a server started with start_stub_server."""
+    host, port = runner.addresses[0][:2]
+    return f"http://{host}:{port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local compatible con OpenAI para benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos de espera antes de responder.")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Segundos entre fragmentos del stream.")
+    parser.add_argument("--words-per-chunk", type=int, default=1)
+    parser.add_argument("--tool-rounds", type=int, default=0, help="Rondas de tool calls antes de la respuesta.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de peticiones que fallan.")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rate-limit", type=int, default=0, help="Peticiones por ventana antes de responder 429.")
+    parser.add_argument("--rate-window", type=float, default=1.0, help="Duración de la ventana en segundos.")
+    args = parser.parse_args()
+    app = create_app(
+        latency=args.latency,
+        chunk_delay=args.chunk_delay,
+        words_per_chunk=args.words_per_chunk,
+        tool_rounds=args.tool_rounds,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+        rate_limit=args.rate_limit,
+        rate_window=args.rate_window,
+    )
+    web.run_app(app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
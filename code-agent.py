@@ -1,11 +1,21 @@
 import os
 import re
+import json
+import argparse
 from termcolor import colored
 from dotenv import load_dotenv
 from gradio_client import Client
 
+from src.utils.file_index import get_file_index
+from src.utils.file_view import view_file
+from src.utils.multi_edit import EditError, multi_edit_file
+from src.utils.prompt_builder import PromptBuilder
+from src.utils.session_store import SessionStore, open_history
+from src.utils.undo_journal import UndoJournal
+
 class DeepSeekAgent:
-    def __init__(self, model_url="reasoning-course/deepseek-ai-DeepSeek-R1-Distill-Qwen-32B", base_dir="."):
+    def __init__(self, model_url="reasoning-course/deepseek-ai-DeepSeek-R1-Distill-Qwen-32B", base_dir=".",
+                 session_store=None, session_id=None, resume=False):
         """Inicializa el agente DeepSeek con el cliente API y el directorio base."""
         self.client = Client(model_url)
         self.max_tokens = 4000
@@ -52,6 +62,11 @@ class DeepSeekAgent:
 
 10. process_code_blocks - Procesar bloques de código para crear o actualizar archivos automáticamente.
 
+11. multi_edit - Aplicar varias ediciones a un archivo de una vez: o se aplican todas o ninguna.
+   Parámetros: 'path' (requerido), 'edits' (requerido): lista JSON de reemplazos {"old_str", "new_str"} e inserciones {"insert_line", "new_str"} (inserta antes de esa línea, como 'insert'), todas relativas al contenido actual.
+   Ejemplo: {"command": "multi_edit", "path": "mi_archivo.py", "edits": [{"old_str": "a = 1", "new_str": "a = 2"}, {"insert_line": 1, "new_str": "import os"}]}
+   Úsalo en lugar de varios str_replace seguidos sobre el mismo archivo.
+
 Además, puedes:
 - Leer el archivo 'requerimientos.md' en el directorio 'project' para entender los requerimientos del proyecto.
 - Analizar el proyecto para determinar el porcentaje de completitud e identificar tareas pendientes.
@@ -66,11 +81,21 @@ Flujo de trabajo:
 6. **Reportar Resultados:** Informa al usuario sobre las acciones tomadas y los pasos adicionales necesarios.
 
 Debes asegurarte de que todas las acciones sean precisas y sigan los principios de código limpio y arquitectura limpia. Si los requerimientos del usuario son vagos, pide aclaraciones. En modo interactivo, confirma cambios significativos con el usuario. En modo autónomo, procede según el análisis y la planificación."""
-        self.conversation_history = []
-        self.file_backups = {}
+        # Cada mensaje se guarda al añadirse; resume=True recupera el final de la última sesión (o de session_id)
+        self.session_store = session_store if session_store else SessionStore()
+        self.conversation_history = open_history(self.session_store, "deepseek", session_id, resume,
+                                                 turn_start=self._is_turn_start)
+        self.max_prompt_chars = 60000  # ~15k tokens; older turns beyond this are left out of the prompt
+        self.prompt_builder = PromptBuilder(self.system_prompt, max_chars=self.max_prompt_chars)
+        self.undo_journal = UndoJournal()  # Deshacer en varios niveles, con estados comprimidos y deduplicados
         self.autonomous_mode = False  # Modo interactivo por defecto
 
     
+    @staticmethod
+    def _is_turn_start(message):
+        """Un mensaje del usuario que no es el resultado de una herramienta."""
+        return message["role"] == "user" and not message["content"].startswith("RESULTADO DE HERRAMIENTA:")
+
     def _read_requirements(self):
         req_path = os.path.join(self.project_dir, "requerimientos.md")
         if not os.path.exists(req_path):
@@ -80,50 +105,52 @@ Debes asegurarte de que todas las acciones sean precisas y sigan los principios
                 content = f.read().strip()
             if not content:
                 return [{"task": "Definir requerimientos del proyecto", "completed": False}]
-                tasks = re.findall(r'^[-\*]\s+(.*)', content, re.MULTILINE)
+            tasks = re.findall(r'^[-\*]\s+(.*)', content, re.MULTILINE)
             if not tasks:
-            # Si no hay formato de lista, asumir que cada línea no vacía es una tarea
+                # Si no hay formato de lista, asumir que cada línea no vacía es una tarea
                 tasks = [line.strip() for line in content.split('\n') if line.strip()]
-                return [{"task": task, "completed": False} for task in tasks] or [{"task": "Clarificar requerimientos", "completed": False}]
+            return [{"task": task, "completed": False} for task in tasks] or [{"task": "Clarificar requerimientos", "completed": False}]
         except Exception as e:
-                return {"error": f"Error al leer 'requerimientos.md': {str(e)}"}
+            return {"error": f"Error al leer 'requerimientos.md': {str(e)}"}
     
     def _analyze_project_completion(self):
-    requirements = self._read_requirements()
-    if "error" in requirements:
-        return requirements
-    project_files = self._list_files(self.project_dir, format_output=False)
-    completed, pending = [], requirements[:]
-
-    # Si no hay requerimientos claros, inferir tareas básicas de los archivos
-    if not requirements or all(r["task"] in ["Clarificar requerimientos", "Definir requerimientos del proyecto"] for r in requirements):
-        inferred_tasks = []
-        if project_files:
-            inferred_tasks.append({"task": "Estructura inicial creada", "completed": True})
-        else:
-            inferred_tasks.append({"task": "Crear estructura inicial", "completed": False})
-        requirements = inferred_tasks
-
-    # Analizar completitud basada en archivos
-    for req in requirements:
-        task_keywords = re.split(r'\s+', req["task"].lower())
-        for file in project_files:
-            if any(keyword in file.lower() for keyword in task_keywords):
-                req["completed"] = True
-                completed.append(req["task"])
-                pending.remove(req)
-                break
-
-    total_reqs = len(requirements)
-    completed_count = len(completed)
-    completion_percentage = (completed_count / total_reqs) * 100 if total_reqs > 0 else (10 if project_files else 0)
-
-    return {
-        "completion_percentage": round(completion_percentage, 2),
-        "completed": completed,
-        "pending": [r["task"] for r in pending],
-        "files": project_files
-    }
+        requirements = self._read_requirements()
+        if "error" in requirements:
+            return requirements
+        project_files = self._list_files(self.project_dir, format_output=False)
+        if isinstance(project_files, str):  # Error case
+            return {"error": project_files}
+        completed, pending = [], requirements[:]
+
+        # Si no hay requerimientos claros, inferir tareas básicas de los archivos
+        if not requirements or all(r["task"] in ["Clarificar requerimientos", "Definir requerimientos del proyecto"] for r in requirements):
+            inferred_tasks = []
+            if project_files:
+                inferred_tasks.append({"task": "Estructura inicial creada", "completed": True})
+            else:
+                inferred_tasks.append({"task": "Crear estructura inicial", "completed": False})
+            requirements = inferred_tasks
+
+        # Analizar completitud basada en archivos
+        for req in requirements:
+            task_keywords = re.split(r'\s+', req["task"].lower())
+            for file in project_files:
+                if any(keyword in file.lower() for keyword in task_keywords):
+                    req["completed"] = True
+                    completed.append(req["task"])
+                    pending.remove(req)
+                    break
+
+        total_reqs = len(requirements)
+        completed_count = len(completed)
+        completion_percentage = (completed_count / total_reqs) * 100 if total_reqs > 0 else (10 if project_files else 0)
+
+        return {
+            "completion_percentage": round(completion_percentage, 2),
+            "completed": completed,
+            "pending": [r["task"] for r in pending],
+            "files": project_files
+        }
     
 
     def _identify_technologies(self):
@@ -145,6 +172,7 @@ Debes asegurarte de que todas las acciones sean precisas y sigan los principios
         """Inicia una sesión de chat interactivo."""
         print(colored("="*10 + " Agente DeepSeek Interactivo " + "="*10, "cyan"))
         print(colored("Escribe 'exit' para salir, 'history' para ver el historial, 'switch_mode' para cambiar de modo", "cyan"))
+        print(colored(f"Sesión: {self.conversation_history.session_id}", "cyan"))
 
         while True:
             user_input = input(colored("Tú: ", "green"))
@@ -234,12 +262,8 @@ Debes asegurarte de que todas las acciones sean precisas y sigan los principios
         return response
 
     def _build_full_prompt(self):
-        """Construye el contexto completo de la conversación."""
-        prompt = self.system_prompt + "\n\n"
-        for msg in self.conversation_history:
-            role = "Usuario" if msg['role'] == "user" else "Asistente"
-            prompt += f"{role}: {msg['content']}\n"
-        return prompt
+        """Construye el contexto de la conversación, renderizando solo los turnos nuevos."""
+        return self.prompt_builder.build(self.conversation_history)
 
     def _has_tool_commands(self, response):
         """Verifica si la respuesta contiene comandos de herramientas."""
@@ -283,6 +307,8 @@ Debes asegurarte de que todas las acciones sean precisas y sigan los principios
             return self._create_file(params.get('path'), params.get('file_text'))
         elif tool_name == "insert":
             return self._insert_in_file(params.get('path'), int(params.get('insert_line')), params.get('new_str'))
+        elif tool_name == "multi_edit":
+            return self._multi_edit(params.get('path'), params.get('edits'))
         elif tool_name == "undo_edit":
             return self._undo_edit(params.get('path'))
         elif tool_name == "list_files":
@@ -354,14 +380,8 @@ Debes asegurarte de que todas las acciones sean precisas y sigan los principios
         try:
             if not os.path.exists(file_path):
                 return f"Error: Archivo no encontrado: {file_path}"
-            with open(file_path, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-            if view_range:
-                start = max(0, view_range[0] - 1)
-                end = view_range[1] if view_range[1] <= len(lines) else len(lines)
-                lines = lines[start:end]
-            result = "".join(f"{i + 1}: {line}" for i, line in enumerate(lines))
-            return result
+            # Solo se leen las líneas pedidas, con un índice de offsets por archivo en caché
+            return view_file(file_path, view_range)
         except Exception as e:
             return f"Error al ver archivo: {str(e)}"
 
@@ -382,13 +402,13 @@ Debes asegurarte de que todas las acciones sean precisas y sigan los principios
         try:
             if not os.path.exists(file_path):
                 return f"Error: Archivo no encontrado: {file_path}"
-            self._backup_file(file_path)
             with open(file_path, "r", encoding="utf-8") as f:
                 content = f.read()
             count = content.count(old_str)
             if count != 1:
                 return f"Error: Encontradas {count} ocurrencias (debe ser exactamente 1)"
             new_content = content.replace(old_str, new_str, 1)
+            self._backup_file(file_path)
             with open(file_path, "w", encoding="utf-8") as f:
                 f.write(new_content)
             return f"Texto reemplazado exitosamente en {file_path}"
@@ -400,11 +420,11 @@ Debes asegurarte de que todas las acciones sean precisas y sigan los principios
         try:
             if not os.path.exists(file_path):
                 return f"Error: Archivo no encontrado: {file_path}"
-            self._backup_file(file_path)
             with open(file_path, "r", encoding="utf-8") as f:
                 lines = f.readlines()
             if insert_line > len(lines):
                 return f"Error: Línea {insert_line} fuera de rango ({len(lines)} líneas)"
+            self._backup_file(file_path)
             lines.insert(insert_line - 1, new_str + '\n' if not new_str.endswith('\n') else new_str)
             with open(file_path, "w", encoding="utf-8") as f:
                 f.writelines(lines)
@@ -412,15 +432,28 @@ Debes asegurarte de que todas las acciones sean precisas y sigan los principios
         except Exception as e:
             return f"Error al insertar texto: {str(e)}"
 
+    def _multi_edit(self, file_path, edits):
+        """Aplicar varias ediciones con una sola lectura y una escritura atómica."""
+        try:
+            if not os.path.exists(file_path):
+                return f"Error: Archivo no encontrado: {file_path}"
+            if isinstance(edits, str):
+                edits = json.loads(edits)
+            # El respaldo se guarda solo cuando se sabe que todas las ediciones se pueden aplicar
+            # insert_line significa lo mismo que en 'insert': se inserta antes de esa línea
+            applied = multi_edit_file(file_path, edits, before_write=self._backup_file, insert_before=True)
+            return f"{applied} ediciones aplicadas exitosamente en {file_path}"
+        except (EditError, json.JSONDecodeError) as e:
+            return f"Error: No se aplicó ninguna edición en {file_path}: {str(e)}"
+        except Exception as e:
+            return f"Error al editar archivo: {str(e)}"
+
     def _undo_edit(self, file_path):
         """Deshacer la última edición en un archivo."""
         try:
-            if file_path not in self.file_backups:
+            if not self.undo_journal.undo(file_path):
                 return f"Error: No hay respaldo para {file_path}"
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(self.file_backups[file_path])
-            del self.file_backups[file_path]
-            return f"Restaurado exitosamente {file_path}"
+            return f"Restaurado exitosamente {file_path} ({self.undo_journal.levels(file_path)} niveles más para deshacer)"
         except Exception as e:
             return f"Error al deshacer edición: {str(e)}"
 
@@ -428,32 +461,14 @@ Debes asegurarte de que todas las acciones sean precisas y sigan los principios
         try:
             if not os.path.isdir(path):
                 return f"Error: Directorio no encontrado: {path}"
-            file_list = []
-            for root, _, files in os.walk(path):
-            
-        for file in files:
-            file_list.append(os.path.relpath(os.path.join(root, file), path))
+            # Índice compartido: solo se vuelven a leer los directorios que cambiaron
+            file_list = get_file_index(path).files()
             if format_output:
                 return f"Archivos en '{path}':\n" + "\n".join(file_list) if file_list else "  - Ninguno"
             return file_list
         except Exception as e:
             return f"Error al listar archivos: {str(e)}"
 
-
-
-
-"""    def _list_files(self, path, format_output=True):
-        """Listar archivos en un directorio."""
-        try:
-            if not os.path.isdir(path):
-                return f"Error: Directorio no encontrado: {path}"
-            files = os.listdir(path)
-            if format_output:
-                return f"Archivos en '{path}':\n" + "\n".join(files)
-            return files  # Retorna lista sin formato para uso interno
-        except Exception as e:
-            return f"Error al listar archivos: {str(e)}"""
-
     def _delete_file(self, path):
         """Eliminar un archivo."""
         try:
@@ -486,9 +501,8 @@ Debes asegurarte de que todas las acciones sean precisas y sigan los principios
     def _backup_file(self, file_path):
         """Crear respaldo antes de editar."""
         try:
-            if file_path not in self.file_backups and os.path.exists(file_path):
-                with open(file_path, "r", encoding="utf-8") as f:
-                    self.file_backups[file_path] = f.read()
+            if os.path.exists(file_path):
+                self.undo_journal.record(file_path)
         except Exception:
             pass
 
@@ -512,7 +526,11 @@ def main():
     """Punto de entrada principal."""
     try:
         load_dotenv()
-        agent = DeepSeekAgent()
+        parser = argparse.ArgumentParser(description="Agente DeepSeek interactivo")
+        parser.add_argument("--resume", nargs="?", const="", default=None, metavar="SESSION_ID",
+                            help="Reanuda una sesión (la más reciente si no se indica id)")
+        args = parser.parse_args()
+        agent = DeepSeekAgent(session_id=args.resume or None, resume=args.resume is not None)
         agent.chat()
     except KeyboardInterrupt:
         print(colored("\n¡Adiós!", "cyan"))
@@ -1,12 +1,20 @@
 import anthropic
+import argparse
 import os
 import sys
 from termcolor import colored
 from dotenv import load_dotenv
 
+from src.utils.context import ContextWindow, extractive_summary, is_turn_start
+from src.utils.file_view import view_file
+from src.utils.multi_edit import EDITS_SCHEMA, EditError, multi_edit_file
+from src.utils.session_store import SessionStore, open_history
+from src.utils.undo_journal import UndoJournal
+
 
 class ClaudeAgent:
-    def __init__(self, api_key=None, model="claude-3-opus-20240229", max_tokens=4000):
+    def __init__(self, api_key=None, model="claude-3-opus-20240229", max_tokens=4000,
+                 session_store=None, session_id=None, resume=False):
         """Initialize the Claude agent with API key and model."""
         self.api_key = api_key if api_key else os.environ.get("ANTHROPIC_API_KEY")
         if not self.api_key:
@@ -37,6 +45,11 @@ class ClaudeAgent:
 5.  undo_edit - Use this to revert the last edit made to a file.
     Parameters: path (required)
 
+6.  multi_edit (separate tool) - Use this to make several edits to one file at once.
+    Parameters: path (required), edits (required): a list of {old_str, new_str} replacements and
+    {insert_line, new_str} inserts, all relative to the current contents. Either every edit applies or none does.
+    Best practice: Prefer it over repeated str_replace calls on the same file.
+
 IMPORTANT WORKFLOW:
 
 1.  When asked to modify a file, ALWAYS use view first to see the contents.
@@ -47,13 +60,30 @@ IMPORTANT WORKFLOW:
 For sequential operations, make sure to complete one tool operation fully before starting another.
 """
 
-        self.conversation_history = []
-        self.file_backups = {}  # For undo functionality
+        # Every message is persisted as it is added; resume=True reloads the tail of the last (or given) session
+        self.session_store = session_store if session_store else SessionStore()
+        self.conversation_history = open_history(self.session_store, "claude", session_id, resume, turn_start=is_turn_start)
+        self.tools = [
+            {"type": "text_editor_28258124", "name": "str_replace_editor"},
+            {
+                "name": "multi_edit",
+                "description": "Apply several edits to one file in a single atomic write.",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {"path": {"type": "string"}, "edits": EDITS_SCHEMA},
+                    "required": ["path", "edits"],
+                },
+            },
+        ]
+        self.undo_journal = UndoJournal()  # Multi-level undo; saved states are deduplicated and compressed
+        # Bounds the history re-sent each turn; dropped turns are summarized into the system prompt
+        self.context_window = ContextWindow(reserve_tokens=self.max_tokens, summarizer=extractive_summary, summary_role=None)
 
     def chat(self):
         """Start an interactive chat session with Claude."""
         print(colored("=" * 10 + " Interactive Claude Agent with Text Editor Tool " + "=" * 10, "cyan"))
         print(colored("Type 'exit' to quit, 'history' to see conversation history.", "cyan"))
+        print(colored(f"Session: {self.conversation_history.session_id}", "cyan"))
 
         while True:
             user_input = input(colored("You: ", "green"))
@@ -82,12 +112,13 @@ For sequential operations, make sure to complete one tool operation fully before
 
         try:
             # Initial Claude call with the user's message
+            self._fit_context()
             response = self.client.messages.create(
                 model=self.model,
                 max_tokens=self.max_tokens,
-                system_prompt=self.system_prompt,
+                system=self._current_system_prompt(),
                 messages=self.conversation_history,
-                tools=[{"type": "text_editor_28258124", "name": "str_replace_editor"}],  # Add Tool
+                tools=self.tools,
             )
 
             # Add Claude's response to history
@@ -116,12 +147,13 @@ For sequential operations, make sure to complete one tool operation fully before
                         })
 
                 # Get the next response from Claude with the tool results
+                self._fit_context()
                 response = self.client.messages.create(
                     model=self.model,
                     max_tokens=self.max_tokens,
-                    system_prompt=self.system_prompt,
+                    system=self._current_system_prompt(),
                     messages=self.conversation_history,
-                    tools=[{"type": "text_editor_28258124", "name": "str_replace_editor"}],  # Keep Tool
+                    tools=self.tools,
                 )
 
                 # Add Claude's response to the history
@@ -138,17 +170,30 @@ For sequential operations, make sure to complete one tool operation fully before
             print(colored(f"❌ Error: {str(e)}", "red"))
             return None
 
+    def _fit_context(self):
+        """Keep the conversation history within the model's token budget."""
+        self.conversation_history[:] = self.context_window.compact(self.conversation_history, self.model)
+
+    def _current_system_prompt(self):
+        """System prompt plus the summary of turns dropped from the history, if any."""
+        if not self.context_window.summary:
+            return self.system_prompt
+        return f"{self.system_prompt}\n\nPrevious conversation summary:\n{self.context_window.summary}"
+
     def _handle_tool_use(self, tool_use):
         """Handle Tool use requests from Claude."""
         print(colored(f"\n🤖 In ⚙️ Using tool: {tool_use.name}", "yellow"))
 
         try:
             input_params = tool_use.input
-            command = input_params.get("command")
+            command = input_params.get("command", tool_use.name)
             file_path = input_params.get("path", "")
 
             print(colored(f"Command: {command} on {file_path}", "yellow"))
 
+            if tool_use.name == "multi_edit":
+                return self._multi_edit(file_path, input_params.get("edits", []))
+
             if command == "view":
                 view_range = input_params.get("view_range", None)
                 return self._view_file(file_path, view_range)
@@ -182,20 +227,8 @@ For sequential operations, make sure to complete one tool operation fully before
             if not os.path.exists(file_path):
                 return f"Error: File not found: {file_path}"
 
-            with open(file_path, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-
-            if view_range:
-                start = max(0, view_range[0] - 1)  # Convert to 0-indexed
-                end = view_range[1] if view_range[1] <= len(lines) else len(lines)
-                lines = lines[start:end]
-
-            result = ""
-            for i, line in enumerate(lines):
-                line_num = start + i + 1  # Add line numbers
-                result += f"{line_num}: {line}"
-
-            return result
+            # Only the requested lines are read, through a cached line-offset index
+            return view_file(file_path, view_range)
 
         except Exception as e:
             return f"Error viewing file: {str(e)}"
@@ -222,9 +255,6 @@ For sequential operations, make sure to complete one tool operation fully before
             if not os.path.exists(file_path):
                 return f"Error: File not found: {file_path}"
 
-            # Create backup
-            self._backup_file(file_path)
-
             with open(file_path, "r", encoding="utf-8") as f:
                 content = f.read()
 
@@ -236,6 +266,9 @@ For sequential operations, make sure to complete one tool operation fully before
             # Replace the text
             new_content = content.replace(old_str, new_str, 1)
 
+            # Create backup, once the edit is known to apply
+            self._backup_file(file_path)
+
             with open(file_path, "w", encoding="utf-8") as f:
                 f.write(new_content)
 
@@ -250,15 +283,15 @@ For sequential operations, make sure to complete one tool operation fully before
             if not os.path.exists(file_path):
                 return f"Error: File not found: {file_path}"
 
-            # Create backup
-            self._backup_file(file_path)
-
             with open(file_path, "r", encoding="utf-8") as f:
                 lines = f.readlines()
 
             if insert_line > len(lines):
                 return f"Error: Line number ({insert_line}) exceeds file length ({len(lines)})"
 
+            # Create backup, once the edit is known to apply
+            self._backup_file(file_path)
+
             # Insert the new text
             lines.insert(insert_line, new_str.endswith('\n') and new_str or new_str + '\n')
 
@@ -270,31 +303,37 @@ For sequential operations, make sure to complete one tool operation fully before
         except Exception as e:
             return f"Error inserting text: {str(e)}"
 
-    def _undo_edit(self, file_path):
-        """Undo the last edit to a file."""
+    def _multi_edit(self, file_path, edits):
+        """Apply a batch of edits to a file with one read and one atomic write."""
         try:
-            if file_path not in self.file_backups:
-                return f"Error: No backup found for {file_path}"
+            if not os.path.exists(file_path):
+                return f"Error: File not found: {file_path}"
 
-            backup_content = self.file_backups[file_path]
+            # The undo level is recorded only once every edit is known to apply
+            applied = multi_edit_file(file_path, edits, before_write=self._backup_file)
+            return f"Successfully applied {applied} edits to {file_path}"
 
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(backup_content)
+        except EditError as e:
+            return f"Error: No edits applied to {file_path}: {str(e)}"
+        except Exception as e:
+            return f"Error applying edits: {str(e)}"
 
-            # Remove the backup
-            del self.file_backups[file_path]
+    def _undo_edit(self, file_path):
+        """Undo the last edit to a file."""
+        try:
+            if not self.undo_journal.undo(file_path):
+                return f"Error: No backup found for {file_path}"
 
-            return f"Successfully restored {file_path} to previous state."
+            remaining = self.undo_journal.levels(file_path)
+            return f"Successfully restored {file_path} to previous state ({remaining} more undo levels)."
 
         except Exception as e:
             return f"Error undoing edit: {str(e)}"
 
     def _backup_file(self, file_path):
-        """Create a backup of a file before editing."""
+        """Record the state of a file before editing it."""
         try:
-            if file_path not in self.file_backups:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    self.file_backups[file_path] = f.read()
+            self.undo_journal.record(file_path)
         except Exception:
             pass
 
@@ -338,7 +377,12 @@ def main():
         # Load environment variables from .env file
         load_dotenv()
 
-        agent = ClaudeAgent()
+        parser = argparse.ArgumentParser(description="Claude agent with a text editor tool")
+        parser.add_argument("--resume", nargs="?", const="", default=None, metavar="SESSION_ID",
+                            help="Resume a session (the most recent one if no id is given)")
+        args = parser.parse_args()
+
+        agent = ClaudeAgent(session_id=args.resume or None, resume=args.resume is not None)
         agent.chat()
 
     except KeyboardInterrupt:
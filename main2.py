@@ -10,6 +10,13 @@ from termcolor import colored
 from pathlib import Path
 import logging
 
+from src.utils.circuit_breaker import CircuitBreaker, HealthMonitor, call_with_failover
+from src.utils.file_index import get_file_index
+from src.utils.multi_edit import EDITS_SCHEMA, EditError, multi_edit_file
+from src.utils.session_store import SessionStore, open_history
+from src.utils.task_graph import PLAN_FORMAT, PlanTask, TaskSkipped, file_lock, parse_plan, run_graph
+from src.utils.undo_journal import UndoJournal
+
 # Configurar logging
 #logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -61,7 +68,8 @@ class ProjectAnalyzer:
             print(colored(f"Error: El directorio '{self.project_path}' no existe.", "red"))
             return {"completion": 0, "missing_components": []}
 
-        for root, dirs, files in os.walk(self.project_path):
+        # Índice compartido en memoria: solo se vuelven a leer los directorios modificados
+        for root, dirs, files in get_file_index(str(self.project_path)).walk():
             total_files += len(files)
             for rule_name, expected_dirs in self.architecture_rules.items():
                 for expected_dir in expected_dirs:
@@ -166,12 +174,14 @@ class ArchitectureManager:
 class BaseAIProvider:
     """Clase base para proveedores de IA"""
 
+    is_llm = True  # Responde con un modelo; False si solo interpreta comandos localmente
+
     def __init__(self, model: str, api_key: str = None):
         self.model = model
         self.api_key = api_key
         self.conversation_history = []
         self.tools = []
-        self.file_backups = {}
+        self.undo_journal = UndoJournal()  # Deshacer en varios niveles, con estados comprimidos y deduplicados
         self.system_prompt = self._base_system_prompt()
         # Nuevas dependencias
         self.analyzer = ProjectAnalyzer("project")
@@ -236,6 +246,12 @@ Workflow Obligatorio:
 7. **Modo Autónomo**: En modo autónomo, puedes crear, modificar y eliminar archivos y directorios automáticamente basándote en el análisis del proyecto y los requisitos dados.
 """
 
+    def health_check(self):
+        """Comprobación barata de disponibilidad; lanza una excepción si el proveedor no responde."""
+        if getattr(self, "client", True) is None:
+            raise RuntimeError("Cliente no inicializado")
+        return True
+
     def add_to_history(self, role: str, content: Any):
         """Añade mensaje al historial"""
         self.conversation_history.append({
@@ -265,6 +281,8 @@ Workflow Obligatorio:
                 return self._insert_in_file(path, insert_line, new_str)
             elif command == "undo_edit":
                 return self._undo_last_edit(path)
+            elif command == "multi_edit":
+                return self._multi_edit(path, tool_calls.get('edits', []))
             elif command == "list_files":
                 return self._list_files_in_directory(path)
             elif command == "delete_file":
@@ -318,47 +336,58 @@ Workflow Obligatorio:
 
     def _replace_in_file(self, path: str, old_str: str, new_str: str) -> str:
         """Reemplazar texto en el archivo"""
-        if path not in self.file_backups:
-            self.file_backups[path] = self._view_file(path)
-
         try:
-            with open(path, 'r') as file:
-                content = file.read()
-            updated_content = content.replace(old_str, new_str)
-            with open(path, 'w') as file:
-                file.write(updated_content)
+            with file_lock(path):
+                with open(path, 'r') as file:
+                    content = file.read()
+                updated_content = content.replace(old_str, new_str)
+                if updated_content != content:
+                    self._backup_file(path)
+                    with open(path, 'w') as file:
+                        file.write(updated_content)
             return f"Reemplazado '{old_str}' con '{new_str}' en '{path}'."
         except Exception as e:
             return f"Error al reemplazar en el archivo: {str(e)}"
 
     def _insert_in_file(self, path: str, insert_line: int, new_str: str) -> str:
         """Insertar texto en una línea específica"""
-        if path not in self.file_backups:
-            self.file_backups[path] = self._view_file(path)
-
         try:
-            with open(path, 'r') as file:
-                lines = file.readlines()
-            
-            if 0 <= insert_line <= len(lines):
-                lines.insert(insert_line, new_str + '\n')
-                with open(path, 'w') as file:
-                    file.writelines(lines)
-                return f"Insertado en la línea {insert_line} en '{path}'."
+            with file_lock(path):
+                with open(path, 'r') as file:
+                    lines = file.readlines()
+
+                if 0 <= insert_line <= len(lines):
+                    self._backup_file(path)
+                    lines.insert(insert_line, new_str + '\n')
+                    with open(path, 'w') as file:
+                        file.writelines(lines)
+                    return f"Insertado en la línea {insert_line} en '{path}'."
             return "Número de línea inválido."
         except Exception as e:
             return f"Error al insertar en el archivo: {str(e)}"
 
+    def _multi_edit(self, path: str, edits: List[Dict]) -> str:
+        """Aplicar varias ediciones con una sola lectura y una escritura atómica"""
+        try:
+            with file_lock(path):
+                # El respaldo se guarda solo cuando se sabe que todas las ediciones se pueden aplicar
+                applied = multi_edit_file(path, edits, before_write=self._backup_file)
+            return f"{applied} ediciones aplicadas en '{path}'."
+        except FileNotFoundError:
+            return f"Error: Archivo no encontrado: {path}"
+        except EditError as e:
+            return f"Error: No se aplicó ninguna edición en '{path}': {str(e)}"
+        except Exception as e:
+            return f"Error al editar el archivo: {str(e)}"
+
     def _undo_last_edit(self, path: str) -> str:
         """Deshacer la última edición"""
-        if path in self.file_backups:
-            try:
-                with open(path, 'w') as file:
-                    file.write(self.file_backups[path])
-                del self.file_backups[path]
-                return f"Edición deshecha en '{path}'."
-            except Exception as e:
-                return f"Error al deshacer la edición: {str(e)}"
+        try:
+            if not self.undo_journal.undo(path):
+                return f"No hay ediciones que deshacer en '{path}'."
+            return f"Edición deshecha en '{path}' ({self.undo_journal.levels(path)} niveles más para deshacer)."
+        except Exception as e:
+            return f"Error al deshacer la edición: {str(e)}"
 
     def _list_files_in_directory(self, path: str) -> str:
         """Listar archivos en un directorio."""
@@ -374,8 +403,7 @@ Workflow Obligatorio:
         """Eliminar un archivo"""
         try:
             if os.path.exists(path):
-                if path not in self.file_backups:
-                    self.file_backups[path] = self._view_file(path)
+                self._backup_file(path)
                 os.remove(path)
                 return f"Archivo '{path}' eliminado exitosamente."
             return f"Error: Archivo no encontrado: {path}"
@@ -391,10 +419,9 @@ Workflow Obligatorio:
             return f"Error al crear el directorio: {str(e)}"
 
     def _backup_file(self, path: str):
-        """Crear respaldo de un archivo"""
-        if os.path.exists(path) and path not in self.file_backups:
-            with open(path, 'r') as file:
-                self.file_backups[path] = file.read()
+        """Guardar el estado de un archivo antes de modificarlo"""
+        if os.path.exists(path):
+            self.undo_journal.record(path)
 
     def _process_code_blocks(self, response: str):
         """Detecta bloques de código y los escribe en archivos"""
@@ -434,6 +461,10 @@ Workflow Obligatorio:
 
     def _write_code_file(self, filepath: str, content: str) -> None:
         """Escribe el contenido en el archivo especificado"""
+        with file_lock(filepath):  # Las tareas del plan pueden escribir en paralelo
+            self._write_code_file_locked(filepath, content)
+
+    def _write_code_file_locked(self, filepath: str, content: str) -> None:
         try:
             os.makedirs(os.path.dirname(filepath), exist_ok=True)
             
@@ -478,6 +509,7 @@ class ClaudeProvider(BaseAIProvider):
 6. list_files - Listar los archivos en un directorio.
 7. delete_file - Eliminar un archivo existente
 8. create_directory - Crear un nuevo directorio
+9. multi_edit - Aplicar varias ediciones ('edits') a un archivo de una vez: todas o ninguna.
 """
 
     def generate_response(self, user_input: str) -> Dict:
@@ -494,11 +526,12 @@ class ClaudeProvider(BaseAIProvider):
                                                     "parameters": {
                                                         "type": "object",
                                                         "properties": {
-                                                            "command": {"type": "string", "enum": ["view", "str_replace", "create", "insert", "undo_edit", "list_files", "delete_file", "create_directory"]},
+                                                            "command": {"type": "string", "enum": ["view", "str_replace", "create", "insert", "undo_edit", "list_files", "delete_file", "create_directory", "multi_edit"]},
                                                             "path": {"type": "string", "description": "The path or directory to use"},
                                                             "old_str": {"type": "string", "description": "The string to find and replace"},
                                                             "new_str": {"type": "string", "description": "The string to replace with"},
-                                                            "insert_line": {"type": "integer", "description": "The line number to insert at"}
+                                                            "insert_line": {"type": "integer", "description": "The line number to insert at"},
+                                                            "edits": EDITS_SCHEMA
                                                         },
                                                         "required": ["command", "path"]
                                                     }
@@ -508,6 +541,13 @@ class ClaudeProvider(BaseAIProvider):
         self._process_code_blocks(message.content[0].text)
         return response_dict
 
+    def health_check(self):
+        """Genera un token: comprueba la generación, no solo que la API conteste."""
+        super().health_check()
+        self.client.messages.create(model=self.model, max_tokens=1,
+                                    messages=[{"role": "user", "content": "ping"}])
+        return True
+
 class OpenAiProvider(BaseAIProvider):
     """Implementación para OpenAI"""
 
@@ -531,6 +571,7 @@ class OpenAiProvider(BaseAIProvider):
 6. list_files - Listar los archivos en un directorio.
 7. delete_file - Eliminar un archivo existente
 8. create_directory - Crear un nuevo directorio
+9. multi_edit - Aplicar varias ediciones ('edits') a un archivo de una vez: todas o ninguna.
 """
 
     def generate_response(self, user_input: str) -> Dict:
@@ -546,6 +587,13 @@ class OpenAiProvider(BaseAIProvider):
         self._process_code_blocks(response_text)
         return {"content": [{"text": response_text}]}
 
+    def health_check(self):
+        """Genera un token: comprueba la generación, no solo que la API conteste."""
+        super().health_check()
+        self.client.chat.completions.create(model=self.model, max_tokens=1,
+                                            messages=[{"role": "user", "content": "ping"}])
+        return True
+
     def _format_messages(self, user_input: str) -> List[Dict]:
         """Formatea los mensajes para la API de OpenAI."""
         messages = [{"role": "system", "content": self.system_prompt},
@@ -562,11 +610,12 @@ class OpenAiProvider(BaseAIProvider):
                 "parameters": {
                     "type": "object",
                     "properties": {
-                        "command": {"type": "string", "enum": ["view", "str_replace", "create", "insert", "undo_edit", "list_files", "delete_file", "create_directory"]},
+                        "command": {"type": "string", "enum": ["view", "str_replace", "create", "insert", "undo_edit", "list_files", "delete_file", "create_directory", "multi_edit"]},
                         "path": {"type": "string", "description": "The path or directory to use"},
                         "old_str": {"type": "string", "description": "The string to find and replace"},
                         "new_str": {"type": "string", "description": "The string to replace with"},
-                        "insert_line": {"type": "integer", "description": "The line number to insert at"}
+                        "insert_line": {"type": "integer", "description": "The line number to insert at"},
+                        "edits": EDITS_SCHEMA
                     },
                     "required": ["command", "path"]
                 }
@@ -576,6 +625,8 @@ class OpenAiProvider(BaseAIProvider):
 class DeepSeekProvider(BaseAIProvider):
     """Implementación para DeepSeek"""
 
+    SPACE = "reasoning-course/deepseek-ai-DeepSeek-R1-Distill-Qwen-32B"
+
     def __init__(self, model: str, api_key: str = None):
         super().__init__(model, api_key)
         if Client is None:
@@ -583,7 +634,7 @@ class DeepSeekProvider(BaseAIProvider):
             print(colored("DeepSeek client will not be initialized due to missing gradio_client library.", "yellow"))
         else:
             try:
-                self.client = Client("reasoning-course/deepseek-ai-DeepSeek-R1-Distill-Qwen-32B")
+                self.client = Client(self.SPACE)
             except Exception as e:
                 print(colored(f"Error initializing DeepSeek client: {e}", "red"))
                 self.client = None
@@ -605,9 +656,22 @@ class DeepSeekProvider(BaseAIProvider):
            return {"content": [{"text": response}]}
         return {"content":[{"text":"DeepSeek model missing"}]}
 
+    def health_check(self):
+        """Pide una respuesta al espacio de Gradio con un cliente propio; falla mientras siga caído."""
+        if Client is None:
+            raise RuntimeError("gradio_client no está instalado")
+        # Cliente aparte: las peticiones en curso pueden estar usando self.client desde otros hilos
+        client = Client(self.SPACE)
+        client.predict(message="ping", api_name="/chat")
+        if self.client is None:
+            self.client = client  # Falló al iniciar: se adopta el cliente que ya respondió
+        return True
+
 class GeminiProvider(BaseAIProvider):
     """Implementación para Gemini"""
 
+    is_llm = False  # generate_response usa el intérprete local de comandos
+
     def __init__(self, model: str, api_key: str):
         super().__init__(model, api_key)
         self.system_prompt = """Eres un arquitecto de software experto con 10 años de experiencia en la creación de aplicaciones robustas y escalables.
@@ -629,13 +693,26 @@ class GeminiProvider(BaseAIProvider):
         self._process_code_blocks(response['content'][0]['text'])
         return response
 
+    def health_check(self):
+        """Ejecuta el análisis del proyecto, que es lo que responde este proveedor."""
+        if not self.analyzer.project_path.is_dir():
+            raise RuntimeError(f"Directorio del proyecto no disponible: {self.analyzer.project_path}")
+        self.process_natural_command("analiza el proyecto")
+        return True
+
 class MultiAIEditor:
     """Sistema unificado de edición con múltiples proveedores"""
 
-    def __init__(self, provider: str, model: str):
+    # Orden de failover: primero el proveedor pedido, luego el resto en este orden. Solo
+    # proveedores con modelo: Gemini responde con el intérprete local y no puede sustituirlos
+    FAILOVER_ORDER = ("openai", "claude", "deepseek")
+
+    def __init__(self, provider: str, model: str, session_store: Optional[SessionStore] = None,
+                 session_id: Optional[str] = None, resume: bool = False, max_parallel_tasks: int = 4):
         self.providers = {}
         self.model = model
         self.autonomous_mode = False
+        self.max_parallel_tasks = max_parallel_tasks  # Tareas del plan ejecutadas a la vez en modo autónomo
         self.project_path = "project"
 
         openai_api_key = os.getenv("OPENAI_API_KEY")
@@ -666,10 +743,45 @@ class MultiAIEditor:
             if not self.developer_provider and not self.architect_provider:
                 print(colored("No Developer or Architect found", "red"))
 
-        self.history = []
+        # Un circuit breaker por proveedor; los abiertos se sondean en segundo plano hasta que se recuperan
+        self.breakers = {name: CircuitBreaker(name) for name in self.providers}
+        self.health_monitor = HealthMonitor()
+        for name, ai_provider in self.providers.items():
+            self.health_monitor.watch(self.breakers[name], ai_provider.health_check)
+
+        # Historial persistente: cada entrada se guarda al añadirse; resume=True recupera el final de la sesión
+        self.session_store = session_store or SessionStore()
+        self.history = open_history(self.session_store, "multi_ai_editor", session_id, resume)
         if not os.path.exists(self.project_path):
            os.mkdir(self.project_path)
 
+    def _failover_chain(self, preferred: Optional[str]) -> List:
+        """(nombre, proveedor) a intentar: el preferido y después el resto, según FAILOVER_ORDER"""
+        names = [preferred] if preferred in self.providers else []
+        names += [name for name in self.FAILOVER_ORDER if name in self.providers and name not in names]
+        return [(name, self.providers[name]) for name in names]
+
+    def _generate(self, preferred: Optional[str], prompt: str) -> Dict:
+        """generate_response con failover: salta los proveedores con el circuito abierto o que fallan"""
+        def ask(ai_provider):
+            if getattr(ai_provider, "client", True) is None:
+                raise RuntimeError("Cliente no inicializado")
+            if not ai_provider.is_llm and ai_provider is not self.providers.get(preferred):
+                raise RuntimeError("No responde con un modelo; no sirve como sustituto")
+            response = ai_provider.generate_response(prompt)
+            if not any(isinstance(part, dict) and str(part.get("text") or "").strip()
+                       for part in response.get("content", [])):
+                raise RuntimeError("Respuesta vacía")
+            return response
+
+        name, response = call_with_failover(self._failover_chain(preferred), self.breakers, ask)
+        if preferred and name != preferred:
+            print(colored(f"'{preferred}' no disponible; responde '{name}'", "yellow"))
+        return response
+
+    def _provider_name(self, ai_provider) -> Optional[str]:
+        return next((name for name, candidate in self.providers.items() if candidate is ai_provider), None)
+
     def switch_provider(self, provider: str):
         """Cambiar proveedor activo"""
         if provider in self.providers:
@@ -706,6 +818,7 @@ class MultiAIEditor:
 
         print(colored("=" * 20 + " Editor Multi-IA " + "=" * 20, "cyan"))
         print("Proveedores disponibles: " + " | ".join(self.providers.keys()))
+        print(f"Sesión: {self.history.session_id}")
 
         while True:
             user_input = input(colored("\nTu: ", "green"))
@@ -735,7 +848,7 @@ class MultiAIEditor:
                     print(colored("No AI provider is active.", "red"))
                     return
 
-                response = self.active_provider.generate_response(command)
+                response = self._generate(self.current_provider, command)
 
                 if hasattr(response, 'tool_uses') and self.current_provider != "deepseek":
                     for tool in response.tool_uses:
@@ -754,18 +867,19 @@ class MultiAIEditor:
 
         if not self.architect_provider:
             print(colored("Warning: No Architect (Gemini) provider available. Using developer for all tasks.", "yellow"))
-            architect_response = self.active_provider.generate_response(command)
+            architect_response = self._generate(self.current_provider, command)
             self._display_response(architect_response, command)
             return
 
         print(colored("Architect (Gemini) is analyzing the project...", "cyan"))
-        analysis_result = self.architect_provider.generate_response("Analiza el proyecto")
+        architect = self._provider_name(self.architect_provider)
+        analysis_result = self._generate(architect, "Analiza el proyecto")
         print(colored("Analysis from Architect:", "cyan"))
         self._display_response(analysis_result, "Analiza el proyecto")
 
         print(colored("Arquitecto está generando plan de acción...", "cyan"))
-        action_plan_prompt = f"Based on your analysis, provide a detailed plan including specific file creations, modifications, and deletions:\n{analysis_result.get('content',[])[0]['text']}"
-        action_plan_response = self.architect_provider.generate_response(action_plan_prompt)
+        action_plan_prompt = f"Based on your analysis, provide a detailed plan including specific file creations, modifications, and deletions:\n{analysis_result.get('content',[])[0]['text']}\n\n{PLAN_FORMAT}"
+        action_plan_response = self._generate(architect, action_plan_prompt)
         print(colored("Architect action Plan", "cyan"))
         self._display_response(action_plan_response, action_plan_prompt)
 
@@ -773,11 +887,45 @@ class MultiAIEditor:
             print(colored("No developer provider was found", "red"))
             return
 
-        print(colored("The developer will execute the action plan", "yellow"))
-        for content in action_plan_response['content']:
-            if isinstance(content, dict) and 'text' in content:
-                dev_response = self.developer_provider.generate_response(content['text'])
-                self._display_response(dev_response, content['text'])
+        plan_text = "\n".join(content['text'] for content in action_plan_response['content']
+                              if isinstance(content, dict) and 'text' in content)
+        try:
+            tasks = parse_plan(plan_text)
+        except ValueError as e:
+            print(colored(f"Plan inválido ({str(e)}); se ejecuta como una sola tarea", "yellow"))
+            tasks = [PlanTask(id="t1", description=plan_text)]
+
+        print(colored(f"The developer will execute the action plan ({len(tasks)} tareas, "
+                      f"hasta {self.max_parallel_tasks} en paralelo)", "yellow"))
+        developer = self._provider_name(self.developer_provider)
+
+        def run_task(task: PlanTask) -> Dict:
+            return self._generate(developer, self._task_prompt(task, plan_text, len(tasks)))
+
+        def task_done(task: PlanTask, result):
+            if isinstance(result, TaskSkipped):
+                print(colored(f"Tarea {task.id} omitida: {str(result)}", "yellow"))
+            elif isinstance(result, BaseException):
+                print(colored(f"Tarea {task.id} falló: {str(result)}", "red"))
+            else:
+                self._display_response(result, task.description)
+
+        run_graph(tasks, run_task, self.max_parallel_tasks, on_done=task_done)
+
+    @staticmethod
+    def _task_prompt(task: PlanTask, plan_text: str, total: int) -> str:
+        """Prompt del desarrollador para una tarea; un plan sin tareas se envía tal cual, como antes"""
+        if total == 1 and task.description == plan_text:
+            return plan_text
+        files = f"\nArchivos: {', '.join(task.files)}" if task.files else ""
+        # Contenido actual, leído al empezar la tarea: incluye los cambios de tareas anteriores sobre el mismo archivo
+        for path in task.files:
+            if os.path.isfile(path):
+                with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                    files += f"\n\nContenido actual de {path}:\n```\n{f.read()}\n```"
+        return (f"Plan completo (solo como contexto):\n{plan_text}\n\n"
+                f"Realiza únicamente la tarea {task.id}: {task.description}{files}\n"
+                "Escribe cada archivo completo en un bloque ```file:ruta```, conservando los cambios que ya tenga.")
 
     def _display_response(self, response: Dict, command: str):
         """Mostrar respuesta formateada"""
@@ -819,11 +967,15 @@ def main():
     parser = argparse.ArgumentParser(description="MultiAIEditor - A text editor that uses multiple AI providers.")
     parser.add_argument("--provider", type=str, default="openai", help="The AI provider to use (claude, openai, deepseek, gemini).")
     parser.add_argument("--model", type=str, default="gpt-3.5-turbo", help="The model to use for the provider.")
+    parser.add_argument("--parallel", type=int, default=4, help="Plan tasks run concurrently in autonomous mode.")
+    parser.add_argument("--resume", nargs="?", const="", default=None, metavar="SESSION_ID",
+                        help="Resume a session (the most recent one if no id is given).")
 
     args = parser.parse_args()
 
     try:
-        editor = MultiAIEditor(args.provider, args.model)
+        editor = MultiAIEditor(args.provider, args.model, session_id=args.resume or None,
+                               resume=args.resume is not None, max_parallel_tasks=args.parallel)
         editor.interactive_session()
     except KeyboardInterrupt:
         print(colored("\nOperación cancelada por el usuario", "yellow"))
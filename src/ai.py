@@ -1,13 +1,28 @@
 import os
+import copy
 import inspect
 import json
+import asyncio
+import contextvars
+import functools
+import importlib
+import importlib.util
+import time
+from collections import deque
 from abc import ABC, abstractmethod
-from typing import Literal, List, Dict, Any, AsyncGenerator, Optional, Callable
+from typing import Literal, List, Dict, Any, AsyncGenerator, AsyncIterator, Awaitable, Iterable, Optional, Callable, Tuple
 from pydantic import BaseModel
-import aiohttp  # For asynchronous HTTP requests
 
 from src.utils.tools import get_tools
 from src.utils.printer import Printer
+from src.utils.cache import ResponseCache, make_cache_key
+from src.utils.context import ContextWindow, estimate_tokens, message_tokens
+from src.utils.message_buffer import MessageBuffer
+from src.utils.metrics import (CallMetrics, MetricsSink, current_call, emit, reset_current_call,
+                               set_current_call, usage_tokens)
+from src.utils.ratelimit import RateLimiter, get_rate_limiter
+from src.utils.sse import SSEDecoder, DONE, delta_content
+from src.utils.tool_registry import ToolArgumentError, ToolRegistry, tool_spec
 
 printer = Printer(identifier="AI")
 
@@ -18,14 +33,146 @@ class Message(BaseModel):
     tool_calls: List[Dict] = []
     tool_call_id: str = ""
 
+class CompletionResult(BaseModel):
+    """Outcome of one prompt of a complete_many batch."""
+    index: int  # Position of the prompt in the input
+    text: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+class _ToolUse:
+    """Whether tools ran during a provider call: its answer then depends on files, so it is not cached."""
+    __slots__ = ("ran", "outer")
+
+    def __init__(self, outer: Optional["_ToolUse"]):
+        self.ran = False
+        self.outer = outer  # Enclosing call (e.g. a RaceProvider's), marked as well
+
+    def mark(self):
+        use = self
+        while use is not None:
+            use.ran = True
+            use = use.outer
+
+_tool_use: contextvars.ContextVar[Optional[_ToolUse]] = contextvars.ContextVar("tool_use", default=None)
+
+def _mark_tools_ran():
+    use = _tool_use.get()
+    if use is not None:
+        use.mark()
+
+def _wrap_complete(func):
+    """Puts the shared call layer (response cache, metrics) in front of a provider's complete()."""
+    @functools.wraps(func)
+    async def complete(self, *args, **kwargs):
+        record = self._start_call("complete")
+        started = time.perf_counter()
+        token = set_current_call(record)
+        tool_use = _ToolUse(_tool_use.get())
+        tool_token = _tool_use.set(tool_use)
+        text = None
+        try:
+            key = self._cache_key(args, kwargs) if self.cache is not None else None
+            if key is not None:
+                chunks = self.cache.get(key)
+                if chunks is not None:
+                    text = "".join(chunks)
+                    if record is not None:
+                        record.cached = True
+                    self._remember_response(text)
+                    return text
+            result = await func(self, *args, **kwargs)
+            text = result if isinstance(result, str) else None
+            if key is not None and text is not None and not tool_use.ran:
+                self.cache.set(key, [result])
+            return result
+        except BaseException as e:
+            if record is not None:
+                record.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _tool_use.reset(tool_token)
+            reset_current_call(token)
+            self._finish_call(record, started, text)
+    return complete
+
+def _wrap_stream(func):
+    """Same as _wrap_complete for stream(); a cache hit replays the stored chunks."""
+    @functools.wraps(func)
+    async def stream(self, *args, **kwargs):
+        record = self._start_call("stream")
+        started = time.perf_counter()
+        collected = []
+        chunks = None
+        tool_use = _ToolUse(_tool_use.get())
+        try:
+            key = self._cache_key(args, kwargs) if self.cache is not None else None
+            if key is not None:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    if record is not None:
+                        record.cached = True
+                    for chunk in cached:
+                        collected.append(chunk)
+                        yield chunk
+                    self._remember_response("".join(cached))
+                    return
+            chunks = func(self, *args, **kwargs)
+            while True:
+                # The record is current only while the provider's code runs, not while the caller holds a chunk
+                token = set_current_call(record)
+                tool_token = _tool_use.set(tool_use)
+                try:
+                    chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    _tool_use.reset(tool_token)
+                    reset_current_call(token)
+                if record is not None and record.ttft is None and chunk:
+                    record.ttft = time.perf_counter() - started
+                collected.append(chunk)
+                yield chunk
+            # Only reached when the stream ran to completion
+            if key is not None and not tool_use.ran:
+                self.cache.set(key, collected)
+        except GeneratorExit:
+            raise  # The caller stopped reading; not an error
+        except BaseException as e:
+            if record is not None:
+                record.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if chunks is not None:
+                await chunks.aclose()
+            self._finish_call(record, started, "".join(collected))
+    return stream
+
 class AIProvider(ABC):
     def __init__(self, model: str, api_key: str, agent_id: str = None):
         self.model = model
         self.api_key = api_key
         self.messages: List[Message] = []  # Initialize messages list
-        self.tools: List[Callable] = []  # Callable functions
+        self.tools: List[Dict[str, Any]] = []  # JSON schemas sent to the API
+        self.tools_map: Dict[str, Callable] = {}  # Tool functions by name
+        self.tool_registry = ToolRegistry()
         self.config: Dict[str, Any] = {}
         self.agent_id = agent_id
+        self.cache: Optional[ResponseCache] = None  # Optional response cache
+        self.context_window: Optional[ContextWindow] = None  # Optional token budget for self.messages
+        self.rate_limiter: Optional[RateLimiter] = None  # Optional, usually shared per API key
+        self.metrics_sinks: List[MetricsSink] = []  # Receive a CallMetrics per complete/stream call
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Every provider's complete/stream goes through the shared call layer
+        if "complete" in cls.__dict__:
+            cls.complete = _wrap_complete(cls.__dict__["complete"])
+        if "stream" in cls.__dict__:
+            cls.stream = _wrap_stream(cls.__dict__["stream"])
 
     @abstractmethod
     async def complete(self, message: str) -> str:
@@ -38,51 +185,318 @@ class AIProvider(ABC):
     def add_message(self, message: Message):
         self.messages.append(message)
 
-    def set_tools(self):
-         self.tools = get_tools()
+    def set_tools(self, tools: Optional[List[Callable]] = None):
+        """Exposes tool functions (default: get_tools()); their schemas are built once and cached."""
+        self.tool_registry = ToolRegistry(get_tools() if tools is None else tools)
+        self.tools = self.tool_registry.schemas
+        self.tools_map = self.tool_registry.functions
 
-class ProviderImports:
-    openai = None
-    groq = None
-    mistralai = None
-    google = None
-    
-    def __init__(self):
-        try:
-            from openai import OpenAI
-            self.openai = OpenAI
-        except ImportError:
-            pass
-            
+    async def ask(self, prompt: str) -> str:
+        """Sends a user prompt and returns the answer, whatever the provider's call signature."""
+        self.add_message(Message(role="user", text=prompt))
+        return await self.complete(self.model)
+
+    async def ask_stream(self, prompt: str) -> AsyncGenerator[str, None]:
+        self.add_message(Message(role="user", text=prompt))
+        async for chunk in self.stream(self.model):
+            yield chunk
+
+    def fork(self) -> "AIProvider":
+        """
+        Copy with its own history that shares the client, cache and rate limiter,
+        so independent prompts can run concurrently. Close the original, not forks.
+        """
+        clone = copy.copy(self)
+        clone.messages = self.messages.copy()
+        clone.context_window = copy.copy(self.context_window)  # Its summary belongs to one history
+        return clone
+
+    async def iter_complete_many(self, prompts: Iterable[str], concurrency: int = 8,
+                                 progress: Optional[Callable[[int, int], None]] = None
+                                 ) -> AsyncGenerator[CompletionResult, None]:
+        """
+        Answers independent prompts, at most `concurrency` at a time, yielding
+        each result as soon as it finishes. Each prompt is asked on a fork() of
+        this provider; a failed prompt yields a result with `error` set.
+        progress(done, total) is called after every result.
+        """
+        if concurrency < 1:
+            raise ValueError(f"concurrency debe ser al menos 1 (recibido {concurrency})")
+        prompts = list(prompts)
+        pending = iter(enumerate(prompts))  # Shared by the workers
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def worker():
+            for index, prompt in pending:
+                try:
+                    result = CompletionResult(index=index, text=await self.fork().ask(prompt))
+                except Exception as e:
+                    result = CompletionResult(index=index, error=f"{type(e).__name__}: {e}")
+                results.put_nowait(result)
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(prompts)))]
         try:
-            from groq import Groq
-            self.groq = Groq
-        except ImportError:
-            pass
-            
+            for done in range(1, len(prompts) + 1):
+                result = await results.get()
+                if progress is not None:
+                    progress(done, len(prompts))
+                yield result
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def complete_many(self, prompts: Iterable[str], concurrency: int = 8,
+                            progress: Optional[Callable[[int, int], None]] = None) -> List[CompletionResult]:
+        """Same as iter_complete_many, returning every result in input order."""
+        prompts = list(prompts)
+        ordered: List[Optional[CompletionResult]] = [None] * len(prompts)
+        async for result in self.iter_complete_many(prompts, concurrency, progress):
+            ordered[result.index] = result
+        return ordered
+
+    async def close(self):
+        """Releases network resources held by the provider."""
+        pass
+
+    def _cache_key(self, args: tuple, kwargs: Dict[str, Any]) -> str:
+        return make_cache_key(
+            provider=type(self).__name__,
+            model=self.model,
+            args=args,
+            kwargs=kwargs,
+            # A MessageBuffer keeps a running hash of its encoded messages: nothing is re-serialized
+            messages=self.messages.digest() if isinstance(self.messages, MessageBuffer) else list(self.messages),
+            tools=self.tools,
+            config=self.config,
+        )
+
+    def _remember_response(self, text: str):
+        """Records a response served from the cache in the provider's history."""
+        pass
+
+    def set_rate_limiter(self, rate_limiter: Optional[RateLimiter]):
+        self.rate_limiter = rate_limiter
+        client = getattr(self, "client", None)
+        if rate_limiter is not None and hasattr(client, "with_options"):
+            # The limiter owns retries; SDK retries would hide 429s from it
+            self.client = client.with_options(max_retries=0)
+
+    def add_metrics_sink(self, sink: MetricsSink):
+        self.metrics_sinks.append(sink)
+
+    def _start_call(self, call: str) -> Optional[CallMetrics]:
+        if not self.metrics_sinks:
+            return None  # Metrics disabled: no bookkeeping at all
+        return CallMetrics(provider=type(self).__name__, model=self.model, call=call, started_at=time.time())
+
+    def _finish_call(self, record: Optional[CallMetrics], started: float, text: Optional[str]):
+        if record is None:
+            return
+        record.latency = time.perf_counter() - started
+        if not record.completion_tokens and text:
+            record.completion_tokens = estimate_tokens(text)
+            record.tokens_estimated = True
+        generation = record.latency - (record.ttft or 0.0)
+        if record.completion_tokens and generation > 0:
+            record.tokens_per_second = record.completion_tokens / generation
+        emit(self.metrics_sinks, record)
+
+    def _prompt_tokens(self) -> int:
+        """Estimated prompt tokens of a request built from self.messages."""
+        return sum(message_tokens(m) for m in self.messages)
+
+    def _limit_tokens(self, prompt_tokens: int) -> int:
+        """Tokens the rate limiter reserves for a request: the prompt plus room for the answer."""
+        return prompt_tokens + (self.config.get("max_tokens") or 0)
+
+    async def _request(self, make_request: Callable[[], Awaitable[Any]], prompt_tokens: Optional[int] = None) -> Any:
+        """Sends one API request, through the rate limiter when there is one."""
+        record = current_call()
+        if self.rate_limiter is None and record is None:
+            return await make_request()
+        prompt_tokens = self._prompt_tokens() if prompt_tokens is None else prompt_tokens
+        stats = {} if record is not None else None
         try:
-            from mistralai.client import MistralClient
-            self.mistralai = MistralClient
-        except ImportError:
-            pass
-            
+            if self.rate_limiter is None:
+                response = await make_request()
+            else:
+                response = await self.rate_limiter.call(make_request, self._limit_tokens(prompt_tokens), stats)
+        finally:
+            if record is not None:
+                self._record_request(record, stats)
+        if record is not None:
+            self._record_usage(record, usage_tokens(response), prompt_tokens)
+        return response
+
+    async def _request_stream(self, open_stream: Callable[[], AsyncIterator[Any]],
+                              prompt_tokens: Optional[int] = None) -> AsyncGenerator[Any, None]:
+        """Same as _request for a streamed response; items are passed through untouched."""
+        record = current_call()
+        if self.rate_limiter is None and record is None:
+            async for item in open_stream():
+                yield item
+            return
+        prompt_tokens = self._prompt_tokens() if prompt_tokens is None else prompt_tokens
+        stats = {} if record is not None else None
+        usage = None
+        items = open_stream() if self.rate_limiter is None else \
+            self.rate_limiter.stream(open_stream, self._limit_tokens(prompt_tokens), stats)
         try:
-            import google.generativeai as genai
-            self.google = genai
-        except ImportError:
-            pass
+            async for item in items:
+                if record is not None:
+                    usage = usage_tokens(item) or usage  # Only sent by some APIs, in the last chunk
+                yield item
+        finally:
+            if record is not None:
+                self._record_request(record, stats)
+                self._record_usage(record, usage, prompt_tokens)
+
+    @staticmethod
+    def _record_request(record: CallMetrics, stats: Dict[str, float]):
+        record.requests += 1 + int(stats.get("retries", 0))
+        record.retries += int(stats.get("retries", 0))
+        record.queue_time += stats.get("queue_time", 0.0)
+
+    @staticmethod
+    def _record_usage(record: CallMetrics, usage, prompt_tokens: int):
+        if usage is not None:
+            record.prompt_tokens += usage[0]
+            record.completion_tokens += usage[1]
+        else:
+            record.prompt_tokens += prompt_tokens
+            record.tokens_estimated = True
+
+    def _fit_context(self, model: str):
+        """Trims self.messages to the context window budget before a request."""
+        if self.context_window is not None:
+            self.messages = self.context_window.compact(self.messages, model, self.config.get("max_tokens"))
+
+    def _snapshot_history(self):
+        return self.messages.copy()
+
+    def _restore_history(self, snapshot):
+        self.messages = snapshot
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+class ProviderImports:
+    """Resolves provider SDKs lazily, the first time a provider needs them."""
+    # name -> (module, attribute), or a list of them tried in order (SDK layouts
+    # differ between versions); attribute None means the module itself
+    targets = {
+        "openai": ("openai", "OpenAI"),
+        "async_openai": ("openai", "AsyncOpenAI"),
+        "groq": ("groq", "Groq"),
+        "async_groq": ("groq", "AsyncGroq"),
+        # mistralai>=1 has one client with sync and *_async methods: "Mistral" in
+        # the package (1.x) or in mistralai.client (2.x and later)
+        "mistralai": [("mistralai", "Mistral"), ("mistralai.client", "Mistral")],
+        "async_mistralai": [("mistralai", "Mistral"), ("mistralai.client", "Mistral")],
+        "google": ("google.generativeai", None),
+        "aiohttp": ("aiohttp", None),
+    }
+    # ProviderFactory name -> SDK entries the provider needs
+    providers = {
+        "openai": ["async_openai"],
+        "groq": ["async_groq"],
+        "mistral": ["async_mistralai"],
+        "gemini": ["google"],
+        "openrouter": ["aiohttp"],
+    }
+
+    def __init__(self):
+        self._loaded: Dict[str, Any] = {}
+
+    def __getattr__(self, name: str):
+        if name not in self.targets:
+            raise AttributeError(name)
+        return self.load(name)
+
+    def load(self, name: str):
+        """Imports an SDK entry on first access; None when it is not installed."""
+        if name not in self._loaded:
+            candidates = self.targets[name]
+            self._loaded[name] = None
+            for module_name, attribute in candidates if isinstance(candidates, list) else [candidates]:
+                try:
+                    module = importlib.import_module(module_name)
+                    self._loaded[name] = getattr(module, attribute) if attribute else module
+                    break
+                except (ImportError, AttributeError):
+                    continue
+        return self._loaded[name]
+
+    def is_available(self, name: str) -> bool:
+        """Whether an SDK entry's module is installed, found without importing it."""
+        if name in self._loaded:
+            return self._loaded[name] is not None
+        candidates = self.targets[name]
+        for module_name, _ in candidates if isinstance(candidates, list) else [candidates]:
+            try:
+                if importlib.util.find_spec(module_name) is not None:
+                    return True
+            except (ImportError, ValueError):  # Parent package missing, or a broken __spec__
+                continue
+        return False
+
+    def require(self, name: str, error: str):
+        """Loads an SDK entry, raising ImportError(error) when it is missing or incompatible."""
+        if not self.is_available(name):
+            raise ImportError(error)
+        sdk = self.load(name)
+        if sdk is None:
+            raise ImportError(f"{error} (versión instalada no compatible)")
+        return sdk
+
+    def load_provider(self, provider_name: str):
+        for name in self.providers.get(provider_name, []):
+            self.load(name)
 
 provider_imports = ProviderImports()
 
+async def _chat_completion(client, messages, path: str = "/chat/completions", stream: bool = False, **fields):
+    """
+    chat.completions.create for OpenAI-compatible SDK clients (openai, groq).
+    A MessageBuffer history is sent as its pre-encoded JSON when the SDK
+    accepts a raw request body; older SDKs get the plain message list.
+    """
+    if isinstance(messages, MessageBuffer) and "content" in inspect.signature(client.post).parameters:
+        sdk = importlib.import_module(type(client).__module__.split(".")[0])
+        chat_types = importlib.import_module(f"{sdk.__name__}.types.chat")
+        if stream:
+            fields["stream"] = True
+        return await client.post(
+            path,
+            cast_to=chat_types.ChatCompletion,
+            content=messages.request_body(**fields),
+            options={"headers": {"Content-Type": "application/json"}},
+            stream=stream,
+            stream_cls=sdk.AsyncStream[chat_types.ChatCompletionChunk],
+        )
+    return await client.chat.completions.create(messages=list(messages), stream=stream, **fields)
+
+async def _completion_chunks(client, messages, path: str = "/chat/completions", **fields) -> AsyncGenerator[Any, None]:
+    """Chunks of a streamed chat completion from an OpenAI-compatible SDK client."""
+    response = await _chat_completion(client, messages, path, stream=True, **fields)
+    async for chunk in response:
+        yield chunk
+
 class OpenAIClient(AIProvider):
-    def __init__(self, model: str, api_key: str, base_url: Optional[str] = None, agent_id: str = None):
-        if not provider_imports.openai:
-            raise ImportError("OpenAI no instalado. Ejecute: pip install openai")
-        from openai import OpenAI
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+    completions_path = "/chat/completions"  # Relative to the SDK's base URL
+
+    def __init__(self, model: str, api_key: str, base_url: Optional[str] = None, agent_id: str = None,
+                 tool_concurrency: int = 4, tool_timeout: Optional[float] = 60.0):
+        async_openai = provider_imports.require("async_openai", "OpenAI no instalado. Ejecute: pip install openai")
+        super().__init__(model, api_key, agent_id)
+        self.client = async_openai(api_key=api_key, base_url=base_url)
         self.tools_map = {}
         self.tools = []
-        self.messages = []
+        self.messages = MessageBuffer()  # Each message is JSON-encoded once, when appended
         self.config = {
             "temperature": 0.5,
             "max_tokens": 1000,
@@ -90,7 +504,9 @@ class OpenAIClient(AIProvider):
             "frequency_penalty": 0,
             "presence_penalty": 0,
         }
-        super().__init__(model, api_key, agent_id)
+        self.tool_concurrency = tool_concurrency  # Max tool calls running at once
+        self.tool_timeout = tool_timeout  # Default per-tool timeout in seconds (None = no limit)
+        self.tool_timeouts: Dict[str, float] = {}  # Per-tool overrides, keyed by function name
 
     def append(self, messages: List[Message]):
         converted = []
@@ -114,70 +530,164 @@ class OpenAIClient(AIProvider):
         self.messages.extend(converted)
         return self.messages
 
+    def add_message(self, message: Message):
+        self.append([message])
+
+    def _fit_context(self, model: str):
+        buffer = self.messages if isinstance(self.messages, MessageBuffer) else MessageBuffer(self.messages)
+        super()._fit_context(model)
+        self.messages = buffer.replace(self.messages)  # Kept messages are not re-encoded
+
     async def complete(self, model: str) -> str:
-        response = self.client.chat.completions.create(
-            model=model,
-            messages=self.messages,
-            tools=self.tools,
-            **self.config
-        )
-        msg = response.choices[0].message
-        generated = Message(
-            role="assistant",
-            text=msg.content or "",
-            tool_calls=[tc.model_dump() for tc in msg.tool_calls] if msg.tool_calls else []
-        )
-        self.append([generated])
-        
-        if await self.process_tool_calls(generated.tool_calls):
-            return await self.complete(model)
-        return generated.text
+        while True:
+            self._fit_context(model)
+            response = await self._request(lambda: _chat_completion(
+                self.client,
+                self.messages,
+                self.completions_path,
+                model=model,
+                **({"tools": self.tools} if self.tools else {}),
+                **self.config
+            ))
+            msg = response.choices[0].message
+            generated = Message(
+                role="assistant",
+                text=msg.content or "",
+                tool_calls=[tc.model_dump() for tc in msg.tool_calls] if msg.tool_calls else []
+            )
+            self.append([generated])
+
+            # Keep going until the model answers without requesting tools
+            if not await self.process_tool_calls(generated.tool_calls):
+                return generated.text
 
     async def stream(self, model: str) -> AsyncGenerator[str, None]:
-        response = self.client.chat.completions.create(
-            model=model,
-            messages=self.messages,
-            tools=self.tools,
-            stream=True,
-            **self.config
-        )
-        
-        full_response = ""
-        for chunk in response:
-            if chunk.choices[0].delta.content:
-                content = chunk.choices[0].delta.content
-                full_response += content
-                yield content
-                
-        if full_response:
-            self.append([Message(role="assistant", text=full_response)])
-
-    def set_tools(self):
-        self.tools = get_tools()
-        self.tools_map = {tool.__name__: tool for tool in self.tools}
+        while True:
+            self._fit_context(model)
+            response = self._request_stream(lambda: _completion_chunks(
+                self.client,
+                self.messages,
+                self.completions_path,
+                model=model,
+                **({"tools": self.tools} if self.tools else {}),
+                **self.config
+            ))
+
+            parts = []
+            pending: Dict[int, Dict] = {}  # Tool calls being assembled, by stream index
+            dispatched: Dict[int, asyncio.Task] = {}
+            semaphore = asyncio.Semaphore(self.tool_concurrency)
+            try:
+                async for chunk in response:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta
+                    if delta.content:
+                        parts.append(delta.content)
+                        yield delta.content
+                    for fragment in delta.tool_calls or []:
+                        # A new index means every earlier call has all its arguments
+                        for index in pending:
+                            if index < fragment.index and index not in dispatched:
+                                dispatched[index] = self._dispatch_tool_call(pending[index], semaphore)
+                        tc = pending.setdefault(fragment.index, {"id": "", "name": "", "arguments": []})
+                        if fragment.id:
+                            tc["id"] = fragment.id
+                        if fragment.function and fragment.function.name:
+                            tc["name"] += fragment.function.name
+                        if fragment.function and fragment.function.arguments:
+                            tc["arguments"].append(fragment.function.arguments)
+                            # Start the tool while the model keeps streaming once its JSON closes
+                            if (fragment.index not in dispatched
+                                    and fragment.function.arguments.rstrip().endswith("}")
+                                    and self._arguments_complete(tc)):
+                                dispatched[fragment.index] = self._dispatch_tool_call(tc, semaphore)
+                for index in pending:
+                    if index not in dispatched:
+                        dispatched[index] = self._dispatch_tool_call(pending[index], semaphore)
+            except BaseException:
+                for task in dispatched.values():
+                    task.cancel()
+                raise
+
+            order = sorted(pending)
+            tool_calls = [self._assembled_tool_call(pending[index]) for index in order]
+            if parts or tool_calls:
+                self.append([Message(role="assistant", text="".join(parts), tool_calls=tool_calls)])
+            if not tool_calls:
+                return
+            # Results go back in call order, then the model continues the turn
+            self.append(list(await asyncio.gather(*(dispatched[index] for index in order))))
+
+    @staticmethod
+    def _arguments_complete(tc: Dict) -> bool:
+        try:
+            json.loads("".join(tc["arguments"]))
+            return True
+        except json.JSONDecodeError:
+            return False
+
+    @staticmethod
+    def _assembled_tool_call(tc: Dict) -> Dict:
+        return {
+            "id": tc["id"],
+            "type": "function",
+            "function": {"name": tc["name"], "arguments": "".join(tc["arguments"])},
+        }
+
+    def _dispatch_tool_call(self, tc: Dict, semaphore: asyncio.Semaphore) -> asyncio.Task:
+        return asyncio.create_task(self._execute_tool_call(self._assembled_tool_call(tc), semaphore))
+
+    async def close(self):
+        await self.client.close()
+
+    def _remember_response(self, text: str):
+        self.append([Message(role="assistant", text=text)])
+
 
     async def process_tool_calls(self, tool_calls: List[Dict]) -> bool:
         if not tool_calls:
             return False
-            
-        results = []
-        for tc in tool_calls:
-            func_name = tc['function']['name']
-            args = json.loads(tc['function']['arguments'])
-            
-            if func_name in self.tools_map:
-                tool_function = self.tools_map[func_name]
-                result = await tool_function(**args)  # Call the function
-                results.append(Message(
-                    role="tool",
-                    text=str(result), # convert to string
-                    tool_call_id=tc['id']
-                ))
-        
-        if results:
-            self.append(results)
-            return True
-        return False
+
+        # Independent calls run concurrently; gather keeps the original order
+        semaphore = asyncio.Semaphore(self.tool_concurrency)
+        results = await asyncio.gather(*(self._execute_tool_call(tc, semaphore) for tc in tool_calls))
+        self.append(list(results))
+        return True
+
+    async def _execute_tool_call(self, tc: Dict, semaphore: asyncio.Semaphore) -> Message:
+        """Runs a single tool call and wraps its result (or error) in a tool message."""
+        func_name = tc['function']['name']
+        spec = self.tool_registry.get(func_name)
+        if spec is None:
+            return Message(role="tool", text=f"Error: herramienta desconocida '{func_name}'", tool_call_id=tc['id'])
+        try:
+            args = spec.validate(json.loads(tc['function']['arguments'] or "{}"))
+        except (json.JSONDecodeError, ToolArgumentError) as e:
+            return Message(role="tool", text=f"Error: argumentos inválidos para {func_name}: {e}", tool_call_id=tc['id'])
+
+        timeout = self.tool_timeouts.get(func_name, self.tool_timeout)
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                if spec.is_async:
+                    result = await asyncio.wait_for(spec.func(**args), timeout)
+                else:
+                    result = await asyncio.wait_for(asyncio.to_thread(spec.func, **args), timeout)
+            except asyncio.TimeoutError:
+                result = f"Error: {func_name} excedió el tiempo límite de {timeout}s"
+            except Exception as e:
+                result = f"Error en {func_name}: {str(e)}"
+            _mark_tools_ran()
+            record = current_call()
+            if record is not None:
+                record.tool_calls += 1
+                record.tool_time += time.perf_counter() - started
+        return Message(
+            role="tool",
+            text=str(result), # convert to string
+            tool_call_id=tc['id']
+        )
 
     def text_to_speech(self, text: str, voice: str, file_path: str):
         from openai import OpenAI
@@ -190,16 +700,16 @@ class OpenAIClient(AIProvider):
         response.stream_to_file(file_path)
 
 class GroqClient(AIProvider):
+    completions_path = "/openai/v1/chat/completions"  # Relative to the SDK's base URL
+
     def __init__(self, model: str, api_key: str, agent_id: str = None):
-        if not provider_imports.groq:
-            raise ImportError("Groq no instalado. Ejecute: pip install groq")
-        from groq import Groq
-        self.client = Groq(api_key=api_key)
+        async_groq = provider_imports.require("async_groq", "Groq no instalado. Ejecute: pip install groq")
+        super().__init__(model, api_key, agent_id)
+        self.client = async_groq(api_key=api_key)
         self.tools_map = {}
         self.tools = []
-        self.messages = []
+        self.messages = MessageBuffer()  # Each message is JSON-encoded once, when appended
         self.config = {"temperature": 0.5, "max_tokens": 1000}
-        super().__init__(model, api_key, agent_id)
 
     def append(self, messages: List[Message]):
         self.messages.extend([{
@@ -209,29 +719,43 @@ class GroqClient(AIProvider):
             **({"tool_call_id": msg.tool_call_id} if msg.tool_call_id else {})
         } for msg in messages])
 
+    def add_message(self, message: Message):
+        self.append([message])
+
+    def _fit_context(self, model: str):
+        buffer = self.messages if isinstance(self.messages, MessageBuffer) else MessageBuffer(self.messages)
+        super()._fit_context(model)
+        self.messages = buffer.replace(self.messages)  # Kept messages are not re-encoded
+
     async def complete(self, model: str) -> str:
-        response = self.client.chat.completions.create(
-            messages=self.messages,
+        self._fit_context(model)
+        response = await self._request(lambda: _chat_completion(
+            self.client,
+            self.messages,
+            self.completions_path,
             model=model,
-            tools=self.tools,
+            **({"tools": self.tools} if self.tools else {}),
             **self.config
-        )
+        ))
         return response.choices[0].message.content
 
     async def stream(self, model: str) -> AsyncGenerator[str, None]:
-        response = self.client.chat.completions.create(
-            messages=self.messages,
+        self._fit_context(model)
+        response = self._request_stream(lambda: _completion_chunks(
+            self.client,
+            self.messages,
+            self.completions_path,
             model=model,
-            tools=self.tools,
-            stream=True,
+            **({"tools": self.tools} if self.tools else {}),
             **self.config
-        )
-        for chunk in response:
-            yield chunk.choices[0].delta.content or ""
+        ))
+        async for chunk in response:
+            if chunk.choices:
+                yield chunk.choices[0].delta.content or ""
+
+    async def close(self):
+        await self.client.close()
 
-    def set_tools(self):
-        self.tools = get_tools()
-        self.tools_map = {tool.__name__: tool for tool in self.tools}
 
     async def process_tool_calls(self, tool_calls: List[Dict]) -> bool:
         # Implementación similar a OpenAI
@@ -242,15 +766,13 @@ class GroqClient(AIProvider):
 
 class MistralClient(AIProvider):
     def __init__(self, model: str, api_key: str, agent_id: str = None):
-        if not provider_imports.mistralai:
-            raise ImportError("Mistral no instalado. Ejecute: pip install mistralai")
-        from mistralai.client import MistralClient as MistralAI
-        self.client = MistralAI(api_key=api_key)
+        async_mistralai = provider_imports.require("async_mistralai", "Mistral no instalado. Ejecute: pip install mistralai")
+        super().__init__(model, api_key, agent_id)
+        self.client = async_mistralai(api_key=api_key)
         self.tools_map = {}
         self.tools = []
         self.messages = []
         self.config = {"temperature": 0.5, "max_tokens": 1000}
-        super().__init__(model, api_key, agent_id)
 
     def append(self, messages: List[Message]):
         self.messages.extend([{
@@ -258,37 +780,50 @@ class MistralClient(AIProvider):
             "content": msg.text
         } for msg in messages])
 
+    def add_message(self, message: Message):
+        self.append([message])
+
+    def _tool_fields(self) -> Dict[str, Any]:
+        return {"tools": self.tools} if self.tools else {}  # The API rejects an empty tool list
+
     async def complete(self, model: str, agent_id: str = None) -> str:
+        self._fit_context(model)
         if agent_id:
-             chat_response = self.client.chat(
-                model=model,
+            # Agents carry their own model and sampling settings
+            chat_response = await self._request(lambda: self.client.agents.complete_async(
+                agent_id=agent_id,
                 messages=self.messages,
-                #tools=self.tools,
-                 agent_id=agent_id,
-                **self.config
-             )
+                max_tokens=self.config.get("max_tokens"),
+            ))
         else:
-            chat_response = self.client.chat(
+            chat_response = await self._request(lambda: self.client.chat.complete_async(
                 model=model,
                 messages=self.messages,
-                tools=self.tools,
+                **self._tool_fields(),
                 **self.config
-        )
+            ))
         return chat_response.choices[0].message.content
 
     async def stream(self, model: str) -> AsyncGenerator[str, None]:
-        response = self.client.chat_stream(
-            model=model,
-            messages=self.messages,
-            tools=self.tools,
-            **self.config
-        )
-        for chunk in response:
-            yield chunk.choices[0].delta.content or ""
+        self._fit_context(model)
+
+        async def chunks():
+            events = await self.client.chat.stream_async(
+                model=model,
+                messages=self.messages,
+                **self._tool_fields(),
+                **self.config
+            )
+            async for event in events:
+                yield event.data  # CompletionChunk; the last one carries the usage
+
+        async for chunk in self._request_stream(chunks):
+            if chunk.choices:
+                yield chunk.choices[0].delta.content or ""
+
+    async def close(self):
+        await self.client.__aexit__(None, None, None)  # Closes the SDK's own httpx clients
 
-    def set_tools(self):
-         self.tools = get_tools()
-         self.tools_map = {tool.__name__: tool for tool in self.tools}
 
     async def process_tool_calls(self, tool_calls: List[Dict]) -> bool:
         # Implementación similar a OpenAI
@@ -298,102 +833,224 @@ class MistralClient(AIProvider):
         raise NotImplementedError("Mistral no soporta text-to-speech")
 
 class GeminiClient(AIProvider):
+    """
+    Gemini through the SDK's async API. The whole history is sent on every
+    request: "system" messages become the model's system instruction and the
+    rest are mirrored into a ChatSession, reused while the history only grows
+    so each turn converts and appends just the new messages.
+    """
+    ROLES = {"user": "user", "assistant": "model", "tool": "user"}
+
     def __init__(self, model: str, api_key: str, agent_id: str = None):
-        if not provider_imports.google:
-            raise ImportError("Gemini no instalado. Ejecute: pip install google-generativeai")
-        import google.generativeai as genai
-        self.api_key = api_key
+        genai = provider_imports.require("google", "Gemini no instalado. Ejecute: pip install google-generativeai")
+        super().__init__(model, api_key, agent_id)
         genai.configure(api_key=self.api_key)
         self.client = genai.GenerativeModel(model)
-        self.messages: List[Message] = []  # Initialize messages list
         self.config = {"temperature": 0.5}
-        super().__init__(model, api_key, agent_id)
+        self._models: Dict[Tuple[str, str], Any] = {}  # GenerativeModel per (model, system instruction)
+        self._chat = None  # ChatSession mirroring self.messages[:self._chat_length]
+        self._chat_key: Optional[Tuple[str, str]] = None
+        self._chat_length = 0
+        self._chat_last: Optional[Message] = None  # Last message mirrored, to detect rewritten histories
 
-    def add_message(self, message: Message):
-        self.messages.append(message)
+    def fork(self) -> "GeminiClient":
+        clone = super().fork()
+        clone._chat = None  # A ChatSession holds one history
+        clone._chat_last = None
+        return clone
 
-    async def complete(self, prompt: str) -> str:
-        response = self.client.generate_content(
-            contents=[{
-                "parts": [{"text": prompt}]
-            }]
-        )
-        return response.text
+    def _remember_response(self, text: str):
+        self.add_message(Message(role="assistant", text=text))
 
-    async def stream(self, prompt: str) -> AsyncGenerator[str, None]:
-        response = self.client.generate_content(
-            contents=[{
-                "parts": [{"text": prompt}]
-            }],
-            stream=True
+    def _generative_model(self, model: str, system: str):
+        key = (model, system)
+        if key not in self._models:
+            if key == (self.model, ""):
+                self._models[key] = self.client
+            else:
+                self._models[key] = provider_imports.google.GenerativeModel(model, system_instruction=system or None)
+        return self._models[key]
+
+    def _chat_for(self, model: str) -> Tuple[Any, str]:
+        """ChatSession holding all messages but the last, and the text of the last one (the prompt)."""
+        system = "\n\n".join(m.text for m in self.messages if m.role == "system")
+        turns = [m for m in self.messages if m.role != "system"]
+        if not turns:
+            raise ValueError("No hay mensajes que enviar a Gemini")
+        key = (model, system)
+        synced = (
+            self._chat is not None
+            and self._chat_key == key
+            and self._chat_length == len(turns) - 1
+            and (self._chat_length == 0 or turns[self._chat_length - 1] is self._chat_last)
         )
-        for chunk in response:
-            yield chunk.text or ""
+        if not synced:
+            history = [{"role": self.ROLES.get(m.role, "user"), "parts": [m.text]} for m in turns[:-1]]
+            self._chat = self._generative_model(model, system).start_chat(history=history)
+            self._chat_key = key
+        return self._chat, turns[-1].text
+
+    def _chat_answered(self, text: str):
+        """Records the answer; the ChatSession already appended the prompt and the answer."""
+        self.add_message(Message(role="assistant", text=text))
+        turns = [m for m in self.messages if m.role != "system"]
+        self._chat_length = len(turns)
+        self._chat_last = turns[-1]
+
+    @staticmethod
+    def _text(response) -> str:
+        try:
+            return response.text or ""
+        except ValueError:  # No text parts (e.g. a blocked or empty chunk)
+            return ""
+
+    async def complete(self, model: str) -> str:
+        self._fit_context(model)
+        chat, prompt = self._chat_for(model)
+        response = await self._request(lambda: chat.send_message_async(prompt, generation_config=self.config))
+        text = self._text(response)
+        self._chat_answered(text)
+        return text
 
-    def set_tools(self):
-        self.tools = get_tools()
-        self.tools_map = {tool.__name__: tool for tool in self.tools}
+    async def stream(self, model: str) -> AsyncGenerator[str, None]:
+        self._fit_context(model)
+        chat, prompt = self._chat_for(model)
+
+        async def chunks():
+            response = await chat.send_message_async(prompt, generation_config=self.config, stream=True)
+            async for chunk in response:
+                yield chunk
+
+        collected = []
+        completed = False
+        try:
+            async for chunk in self._request_stream(chunks):
+                text = self._text(chunk)
+                collected.append(text)
+                yield text
+            completed = True
+        finally:
+            if completed:
+                self._chat_answered("".join(collected))
+            else:
+                self._chat = None  # The session is left mid-turn; rebuild it on the next call
 
     async def process_tool_calls(self, tool_calls: List[Dict]) -> bool:
         return False  # Implementación base
 
 class OpenAIRouterProvider(AIProvider):
-    def __init__(self, model: str, api_key: str, http_referer: str, x_title: str, agent_id: str = None):
+    def __init__(self, model: str, api_key: str, http_referer: str, x_title: str, agent_id: str = None,
+                 api_url: str = "https://openrouter.ai/api/v1/chat/completions",
+                 pool_limit: int = 100, pool_limit_per_host: int = 20,
+                 keepalive_timeout: float = 30.0, request_timeout: Optional[float] = 300.0):
         super().__init__(model, api_key, agent_id)
         self.http_referer = http_referer
         self.x_title = x_title
-        self.api_url = "https://openrouter.ai/api/v1/chat/completions"
+        self.api_url = api_url
+        self.pool_limit = pool_limit  # Total connections in the pool (0 = unlimited)
+        self.pool_limit_per_host = pool_limit_per_host  # Connections per host (0 = unlimited)
+        self.keepalive_timeout = keepalive_timeout  # Seconds an idle connection is kept open
+        self.request_timeout = request_timeout
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": self.http_referer,  # Required for OpenRouter
+            "X-Title": self.x_title,  # Optional
+        }
+        self._session = None  # aiohttp.ClientSession, created on first request
+        self._session_loop = None
+        self._session_owner = self  # Forks use the pool of the provider they came from
 
-    async def complete(self, message: str) -> str:
-        async with aiohttp.ClientSession() as session:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": self.http_referer,  # Required for OpenRouter
-                "X-Title": self.x_title,  # Optional
-            }
+    def fork(self) -> "OpenAIRouterProvider":
+        clone = super().fork()
+        clone._session = None
+        clone._session_loop = None
+        return clone
 
-            data = {
-                "model": self.model,
-                "messages": [{"role": "user", "content": message}],  # Simple text message
-            }
+    async def _get_session(self):
+        """Returns the pooled session, creating it on first use in the running loop."""
+        if self._session_owner is not self:
+            return await self._session_owner._get_session()
+        aiohttp = provider_imports.require("aiohttp", "aiohttp no instalado. Ejecute: pip install aiohttp")
+        loop = asyncio.get_running_loop()
+        stale, stale_loop = self._session, self._session_loop
+        if stale is not None and not stale.closed and stale_loop is not loop:
+            # Created in another event loop: close it before it is replaced
+            self._session = None
+            if stale_loop is not None and stale_loop.is_running():
+                asyncio.run_coroutine_threadsafe(stale.close(), stale_loop)
+            else:
+                await stale.close()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_limit,
+                limit_per_host=self.pool_limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
+    async def ask(self, prompt: str) -> str:
+        return await self.complete(prompt)
 
-            async with session.post(self.api_url, headers=headers, json=data) as response:
-                response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
-                json_response = await response.json()
-                return json_response["choices"][0]["message"]["content"]
+    async def ask_stream(self, prompt: str) -> AsyncGenerator[str, None]:
+        async for chunk in self.stream(prompt):
+            yield chunk
+
+    async def complete(self, message: str) -> str:
+        data = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": message}],  # Simple text message
+        }
+        json_response = await self._request(lambda: self._post(data), estimate_tokens(message))
+        return json_response["choices"][0]["message"]["content"]
+
+    async def _post(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        session = await self._get_session()
+        async with session.post(self.api_url, json=data) as response:
+            response.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
+            return await response.json()
 
     async def stream(self, message: str) -> AsyncGenerator[str, None]:
-        async with aiohttp.ClientSession() as session:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "HTTP-Referer": self.http_referer,  # Required for OpenRouter
-                "X-Title": self.x_title,  # Optional
-            }
+        data = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": message}],
+            "stream": True
+        }
+        async for content in self._request_stream(lambda: self._stream_events(data), estimate_tokens(message)):
+            yield content
 
-            data = {
-                "model": self.model,
-                "messages": [{"role": "user", "content": message}],
-                "stream": True
-            }
+    async def _stream_events(self, data: Dict[str, Any]) -> AsyncGenerator[str, None]:
+        session = await self._get_session()
+        decoder = SSEDecoder()
+        async with session.post(self.api_url, json=data) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_any():
+                for event in decoder.feed(chunk):
+                    if event.data == DONE:
+                        return
+                    content = delta_content(event.data)
+                    if content:
+                        yield content
+            for event in decoder.flush():
+                if event.data == DONE:
+                    return
+                content = delta_content(event.data)
+                if content:
+                    yield content
 
-            async with session.post(self.api_url, headers=headers, json=data) as response:
-                response.raise_for_status()
-                async for chunk in response.content.iter_any():
-                    try:
-                        chunk_str = chunk.decode('utf-8')
-                        # OpenRouter sends newlines as complete messages
-                        for line in chunk_str.splitlines():
-                            if line.strip():  # Ignore empty lines
-                                yield line
-                    except UnicodeDecodeError:
-                        # Handle non-UTF-8 encoded data if necessary
-                        print("Warning: Could not decode chunk as UTF-8")
-                        continue
-    def set_tools(self):
-         self.tools = get_tools()
-         self.tools_map = {tool.__name__: tool for tool in self.tools}
 
     async def process_tool_calls(self, tool_calls: List[Dict]) -> bool:
         # Implementación similar a OpenAI
@@ -402,50 +1059,169 @@ class OpenAIRouterProvider(AIProvider):
     def text_to_speech(self, text: str, voice: str, file_path: str):
         raise NotImplementedError("Gemini no soporta text-to-speech")
 
+class RaceProvider(AIProvider):
+    """
+    Sends the same prompt to several providers and keeps the first answer
+    (or, when streaming, the first token); the other requests are cancelled.
+
+    With hedge_delay=None every provider starts at once. Otherwise the next
+    provider is only started if no answer arrived after hedge_delay seconds
+    (or after the observed hedge_percentile latency, once enough samples exist).
+    """
+
+    def __init__(self, providers: List[AIProvider], hedge_delay: Optional[float] = None,
+                 hedge_percentile: Optional[float] = None, min_samples: int = 20):
+        if not providers:
+            raise ValueError("RaceProvider necesita al menos un proveedor")
+        super().__init__("+".join(p.model for p in providers), "")
+        self.providers = providers
+        self.hedge_delay = hedge_delay
+        self.hedge_percentile = hedge_percentile  # e.g. 0.95 hedges at the observed p95
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=200)  # Seconds until the winning answer/token
+
+    def fork(self) -> "RaceProvider":
+        clone = super().fork()
+        clone.providers = [provider.fork() for provider in self.providers]
+        return clone
+
+    def current_hedge_delay(self) -> Optional[float]:
+        if self.hedge_percentile is not None and len(self.latencies) >= self.min_samples:
+            ordered = sorted(self.latencies)
+            return ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile))]
+        return self.hedge_delay
+
+    async def ask(self, prompt: str) -> str:
+        return await self.complete(prompt)
+
+    async def ask_stream(self, prompt: str) -> AsyncGenerator[str, None]:
+        async for chunk in self.stream(prompt):
+            yield chunk
+
+    async def complete(self, prompt: str) -> str:
+        async def run(provider: AIProvider):
+            return await provider.ask(prompt)
+
+        snapshots = [provider._snapshot_history() for provider in self.providers]
+        winner, answer = await self._race(run)
+        self._sync_losers(winner, snapshots, prompt, answer)
+        return answer
+
+    async def stream(self, prompt: str) -> AsyncGenerator[str, None]:
+        async def first_token(provider: AIProvider):
+            chunks = provider.ask_stream(prompt)
+            try:
+                async for chunk in chunks:
+                    if chunk:
+                        return chunk, chunks
+            except BaseException:
+                await chunks.aclose()
+                raise
+            return "", chunks
+
+        snapshots = [provider._snapshot_history() for provider in self.providers]
+        winner, (first, chunks) = await self._race(first_token)
+        parts = [first]
+        if first:
+            yield first
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        self._sync_losers(winner, snapshots, prompt, "".join(parts))
+
+    async def _race(self, run):
+        """Runs run(provider) with hedging; returns (winner index, result)."""
+        delay = self.current_hedge_delay()
+        tasks: Dict[asyncio.Task, int] = {}
+        started = time.perf_counter()
+        errors = []
+
+        launched = 0
+
+        def start_next():
+            nonlocal launched
+            tasks[asyncio.create_task(run(self.providers[launched]))] = launched
+            launched += 1
+
+        start_next()
+        while delay is None and launched < len(self.providers):
+            start_next()
+        try:
+            while tasks:
+                timeout = delay if launched < len(self.providers) else None
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    start_next()  # Hedge: the current attempts are slower than expected
+                    continue
+                for task in done:
+                    index = tasks.pop(task)
+                    if task.exception() is None:
+                        self.latencies.append(time.perf_counter() - started)
+                        return index, task.result()
+                    errors.append(task.exception())
+                    printer.yellow(f"Proveedor {self.providers[index].model} falló: {task.exception()}")
+                    if launched < len(self.providers):
+                        start_next()  # Fail over immediately
+            raise errors[-1]
+        finally:
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _sync_losers(self, winner: int, snapshots: List[Any], prompt: str, answer: str):
+        """Rolls back the losers' partial turns and records the winning exchange in their history."""
+        for index, provider in enumerate(self.providers):
+            if index == winner:
+                continue
+            provider._restore_history(snapshots[index])
+            provider.add_message(Message(role="user", text=prompt))
+            provider.add_message(Message(role="assistant", text=answer))
+
+    async def close(self):
+        await asyncio.gather(*(provider.close() for provider in self.providers))
+
 class ProviderFactory:
     @staticmethod
     def create_provider(provider_name: str, model: str, api_key: str, agent_id: str = None, **kwargs):
+        cache = kwargs.pop("cache", None)
+        context_window = kwargs.pop("context_window", None)
+        rate_limit = kwargs.pop("rate_limit", None)  # RateLimiter, or its options for a shared one
+        metrics = kwargs.pop("metrics", None)  # MetricsSink or list of sinks
+        provider_imports.load_provider(provider_name)  # Only this provider's SDK is imported
         if provider_name == "openai":
-            return OpenAIClient(model, api_key, **kwargs, agent_id=agent_id)
+            provider = OpenAIClient(model, api_key, **kwargs, agent_id=agent_id)
         elif provider_name == "mistral":
-            return MistralClient(model, api_key, **kwargs, agent_id=agent_id)
-        if provider_name == "openrouter":
-            return OpenAIRouterProvider(model, api_key, kwargs.get("http_referer", ""), kwargs.get("x_title", ""), agent_id=agent_id, **kwargs)
+            provider = MistralClient(model, api_key, **kwargs, agent_id=agent_id)
+        elif provider_name == "openrouter":
+            http_referer = kwargs.pop("http_referer", "")
+            x_title = kwargs.pop("x_title", "")
+            provider = OpenAIRouterProvider(model, api_key, http_referer, x_title, agent_id=agent_id, **kwargs)
         elif provider_name == "gemini":
-            return GeminiClient(model, api_key, **kwargs, agent_id=agent_id)
+            provider = GeminiClient(model, api_key, **kwargs, agent_id=agent_id)
         elif provider_name == "groq":
-            return GroqClient(model, api_key, **kwargs, agent_id=agent_id)
+            provider = GroqClient(model, api_key, **kwargs, agent_id=agent_id)
         else:
             raise ValueError(f"Unsupported provider: {provider_name}")
+        provider.cache = cache
+        provider.context_window = context_window
+        if isinstance(rate_limit, dict):
+            rate_limit = get_rate_limiter(provider_name, api_key, **rate_limit)
+        provider.set_rate_limiter(rate_limit)
+        if metrics is not None:
+            provider.metrics_sinks = list(metrics) if isinstance(metrics, (list, tuple)) else [metrics]
+        return provider
 
-def toolify(func):
-    type_map = {
-        str: "string",
-        int: "integer",
-        float: "number",
-        bool: "boolean",
-        list: "array",
-        dict: "object",
-        type(None): "null",
-    }
+    @staticmethod
+    def create_race(configs: List[Dict[str, Any]], hedge_delay: Optional[float] = None,
+                    hedge_percentile: Optional[float] = None) -> RaceProvider:
+        """
+        Builds a RaceProvider from create_provider keyword sets, in priority order, e.g.
+        [{"provider_name": "openai", "model": "gpt-4o", "api_key": ...}, {"provider_name": "groq", ...}]
+        """
+        providers = [ProviderFactory.create_provider(**config) for config in configs]
+        return RaceProvider(providers, hedge_delay=hedge_delay, hedge_percentile=hedge_percentile)
 
-    sig = inspect.signature(func)
-    params = {
-        p.name: {"type": type_map.get(p.annotation, "string")}
-        for p in sig.parameters.values()
-    }
-    required = [p.name for p in sig.parameters.values() if p.default == inspect.Parameter.empty]
-
-    return {
-        "type": "function",
-        "function": {
-            "name": func.__name__,
-            "description": (func.__doc__ or "").strip(),
-            "parameters": {
-                "type": "object",
-                "properties": params,
-                "required": required,
-                "additionalProperties": False
-            }
-        }
-    }
+def toolify(func):
+    """OpenAI tool schema of a function (cached; see src/utils/tool_registry.py)."""
+    return tool_spec(func).schema
@@ -0,0 +1,116 @@
+# src/utils/cache.py
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from src.utils.printer import Printer
+
+printer = Printer(identifier="CACHE")
+
+
+def _normalize(obj: Any) -> Any:
+    """JSON fallback for values found in message lists, tool lists and configs."""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if callable(obj):
+        return getattr(obj, "__name__", repr(obj))
+    return repr(obj)
+
+
+def make_cache_key(**parts: Any) -> str:
+    """
+    Builds a stable key from the parts of a request (model, messages, tools, config...).
+    Dict keys are sorted so equivalent requests map to the same key.
+    """
+    payload = json.dumps(parts, sort_keys=True, default=_normalize, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    In-memory LRU of model responses with an optional on-disk store.
+
+    Responses are kept as the list of chunks that produced them, so a cached
+    stream can be replayed as-is and a cached completion is the joined text.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024, directory: Optional[str] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, key: str) -> Optional[List[str]]:
+        chunks = self._entries.get(key)
+        if chunks is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return chunks
+        if self.directory:
+            chunks = self._load(key)
+            if chunks is not None:
+                self._remember(key, chunks)
+                self.hits += 1
+                return chunks
+        self.misses += 1
+        return None
+
+    def set(self, key: str, chunks: List[str]):
+        chunks = list(chunks)
+        self._remember(key, chunks)
+        if self.directory:
+            self._store(key, chunks)
+
+    def clear(self):
+        """Empties the in-memory LRU (files on disk are kept)."""
+        self._entries.clear()
+        self._sizes.clear()
+        self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remember(self, key: str, chunks: List[str]):
+        size = sum(len(chunk.encode("utf-8")) for chunk in chunks)
+        if size > self.max_bytes:
+            return  # Larger than the whole cache; keep it on disk only
+        if key in self._entries:
+            self.current_bytes -= self._sizes[key]
+        self._entries[key] = chunks
+        self._entries.move_to_end(key)
+        self._sizes[key] = size
+        self.current_bytes += size
+        while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+            evicted, _ = self._entries.popitem(last=False)
+            self.current_bytes -= self._sizes.pop(evicted)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load(self, key: str) -> Optional[List[str]]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)["chunks"]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            printer.yellow(f"Entrada de caché ilegible {key}: {str(e)}")
+            return None
+
+    def _store(self, key: str, chunks: List[str]):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"chunks": chunks}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)  # Atomic, so readers never see half-written entries
+        except Exception as e:
+            printer.yellow(f"No se pudo guardar la entrada de caché {key}: {str(e)}")
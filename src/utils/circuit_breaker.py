@@ -0,0 +1,175 @@
+# src/utils/circuit_breaker.py
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.utils.printer import Printer
+
+printer = Printer(identifier="CIRCUIT")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """The provider's circuit is open: the call was not attempted."""
+
+
+class CircuitBreaker:
+    """
+    Health of one provider.
+
+    Opens after `failure_threshold` consecutive failures or `slow_threshold`
+    consecutive calls slower than `latency_slo` seconds. While open, calls are
+    refused without waiting. Recovery always goes through half-open, where a
+    single trial call is let through and its outcome (failure or latency)
+    decides: a HealthMonitor moves the breaker there when a probe succeeds;
+    unprobed breakers get there after `reset_timeout` seconds.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, slow_threshold: int = 3,
+                 latency_slo: Optional[float] = 60.0, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slow_threshold = slow_threshold
+        self.latency_slo = latency_slo
+        self.reset_timeout = reset_timeout
+        self.probed = False  # Set by HealthMonitor.watch: recovery is decided by probes
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._slow = 0
+        self._opened_at = 0.0
+        self._trial = False  # A half-open trial call is in flight
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go through now (reserves the trial call when half-open)."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and not self.probed and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self, latency: float = 0.0):
+        with self._lock:
+            self._trial = False
+            self._failures = 0
+            if self.latency_slo is not None and latency > self.latency_slo:
+                self._slow += 1
+                if self._state == HALF_OPEN or self._slow >= self.slow_threshold:
+                    self._open(f"{self._slow} respuestas por encima de {self.latency_slo:g}s")
+                return
+            self._slow = 0
+            if self._state != CLOSED:
+                printer.green(f"Proveedor '{self.name}' recuperado")
+            self._state = CLOSED
+
+    def record_failure(self, error: Optional[BaseException] = None):
+        with self._lock:
+            self._trial = False
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._open(f"{self._failures} fallos consecutivos ({error})")
+
+    def reset(self):
+        """Closes the circuit unconditionally."""
+        with self._lock:
+            if self._state != CLOSED:
+                printer.green(f"Proveedor '{self.name}' recuperado")
+            self._state = CLOSED
+            self._failures = self._slow = 0
+            self._trial = False
+
+    def half_open(self):
+        """Lets one trial call through (a health probe succeeded); the real call decides whether it closes."""
+        with self._lock:
+            if self._state == OPEN:
+                self._state = HALF_OPEN
+                self._trial = False
+
+    def _open(self, reason: str):
+        if self._state != OPEN:
+            printer.yellow(f"Circuito abierto para '{self.name}': {reason}")
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        if not self.allow():
+            raise CircuitOpenError(f"Proveedor '{self.name}' no disponible (circuito abierto)")
+        start = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success(time.monotonic() - start)
+        return result
+
+
+class HealthMonitor:
+    """
+    Probes open breakers from a daemon thread every `interval` seconds. A
+    probe that succeeds within the breaker's latency SLO moves it to
+    half-open; it only closes once a real call succeeds there.
+    """
+
+    def __init__(self, interval: float = 15.0):
+        self.interval = interval
+        self._watched: List[Tuple[CircuitBreaker, Callable[[], Any]]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, breaker: CircuitBreaker, probe: Callable[[], Any]):
+        """probe() must raise (or return False) while the provider is unhealthy."""
+        breaker.probed = True
+        self._watched.append((breaker, probe))
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="health-monitor", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for breaker, probe in list(self._watched):
+                if breaker.state != OPEN:
+                    continue
+                start = time.monotonic()
+                try:
+                    healthy = probe() is not False
+                except Exception:
+                    healthy = False
+                latency = time.monotonic() - start
+                if healthy and (breaker.latency_slo is None or latency <= breaker.latency_slo):
+                    breaker.half_open()
+
+    def stop(self):
+        self._stop.set()
+
+
+def call_with_failover(chain: Sequence[Tuple[str, Any]], breakers: Dict[str, CircuitBreaker],
+                       call: Callable[[Any], Any]) -> Tuple[str, Any]:
+    """
+    Runs call(provider) on the first provider of the chain whose circuit
+    allows it, moving on to the next one when it fails. Returns (name, result);
+    raises the last error when none succeeds.
+    """
+    error: Optional[BaseException] = None
+    for name, provider in chain:
+        breaker = breakers.get(name)
+        try:
+            result = breaker.call(call, provider) if breaker else call(provider)
+        except CircuitOpenError as e:
+            error = error or e
+            continue
+        except Exception as e:
+            printer.yellow(f"Falló '{name}': {str(e)}")
+            error = e
+            continue
+        return name, result
+    raise error or CircuitOpenError("No hay proveedores configurados")
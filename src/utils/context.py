@@ -0,0 +1,219 @@
+# src/utils/context.py
+import json
+from typing import Any, Callable, Dict, List, Optional
+
+SUMMARY_PREFIX = "Resumen de la conversación anterior:\n"
+
+# Context sizes in tokens, matched by model-name prefix (longest prefix wins)
+MODEL_TOKEN_BUDGETS: Dict[str, int] = {
+    "gpt-4o": 128000,
+    "gpt-4-turbo": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+    "claude-3": 200000,
+    "llama-3.1": 131072,
+    "llama3": 8192,
+    "mixtral-8x7b": 32768,
+    "mistral": 32768,
+    "gemini-1.5": 1000000,
+    "gemini": 32768,
+}
+DEFAULT_TOKEN_BUDGET = 8192
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+def _field(message: Any, name: str, default: Any = None) -> Any:
+    if isinstance(message, dict):
+        return message.get(name, default)
+    return getattr(message, name, default)
+
+
+def _block_text(block: Any) -> str:
+    if isinstance(block, str):
+        return block
+    text = _field(block, "text")
+    if text is not None:
+        return text
+    content = _field(block, "content")
+    if content is not None:
+        return content if isinstance(content, str) else "".join(_block_text(b) for b in content)
+    tool_input = _field(block, "input")
+    if tool_input is not None:
+        return json.dumps(tool_input, default=str)
+    return ""
+
+
+def message_text(message: Any) -> str:
+    """Extracts the text of a message in any of the formats used by the providers."""
+    content = _field(message, "content")
+    if content is None:
+        content = _field(message, "text", "")
+    text = content if isinstance(content, str) else "".join(_block_text(b) for b in content or [])
+    for tc in _field(message, "tool_calls") or []:
+        text += _field(_field(tc, "function", {}), "arguments", "") or ""
+    return text
+
+
+def _text_field(message: Any) -> str:
+    """Name of the field holding a model message's text ("content" or, for src.ai.Message, "text")."""
+    return "content" if "content" in getattr(type(message), "model_fields", {}) else "text"
+
+
+def _new_message(history: List[Any], role: str, text: str) -> Any:
+    """A message of the same kind as those of history: a dict, or an instance of their model class."""
+    like = next((m for m in history if not isinstance(m, dict)), None)
+    if like is None:
+        return {"role": role, "content": text}
+    return type(like)(role=role, **{_text_field(like): text})
+
+
+def message_tokens(message: Any) -> int:
+    return estimate_tokens(message_text(message)) + 4  # Role and separators
+
+
+def _is_tool_result(message: Any) -> bool:
+    if _field(message, "role") == "tool":
+        return True
+    content = _field(message, "content")
+    return isinstance(content, list) and any(_field(b, "type") == "tool_result" for b in content)
+
+
+def is_turn_start(message: Any) -> bool:
+    return _field(message, "role") == "user" and not _is_tool_result(message)
+
+
+def extractive_summary(previous: str, dropped: List[Any], max_chars: int = 2000) -> str:
+    """
+    Summarizer that needs no model: keeps the first line of each user/assistant message.
+    Any callable with the same signature (e.g. one backed by a model) can replace it.
+    """
+    lines = [previous] if previous else []
+    for message in dropped:
+        if _is_tool_result(message):
+            continue
+        text = message_text(message).strip()
+        if text:
+            role = "Usuario" if _field(message, "role") == "user" else "Asistente"
+            lines.append(f"- {role}: {text.splitlines()[0][:200]}")
+    return "\n".join(lines)[-max_chars:]
+
+
+class ContextWindow:
+    """
+    Keeps a provider's message history within a per-model token budget.
+
+    The leading system messages and the most recent turns are kept verbatim.
+    When the history is over budget, old tool results are truncated first and
+    then the oldest turns are dropped whole, so tool calls and their results are
+    never separated. Dropped turns can be folded into a rolling summary.
+    """
+
+    def __init__(self, budget: Optional[int] = None, budgets: Optional[Dict[str, int]] = None,
+                 reserve_tokens: int = 1000, keep_recent: int = 6, tool_result_chars: int = 2000,
+                 summarizer: Optional[Callable[[str, List[Any]], str]] = None,
+                 summary_role: Optional[str] = "system"):
+        self.budget = budget  # Fixed budget; overrides the per-model table
+        self.budgets = {**MODEL_TOKEN_BUDGETS, **(budgets or {})}
+        self.reserve_tokens = reserve_tokens  # Room left for the model's answer
+        self.keep_recent = keep_recent  # Messages at the end that are never touched
+        self.tool_result_chars = tool_result_chars  # Old tool results are cut to this size
+        self.summarizer = summarizer
+        self.summary_role = summary_role  # None: caller places self.summary (e.g. in a system prompt)
+        self.summary = ""
+
+    def budget_for(self, model: str) -> int:
+        if self.budget is not None:
+            return self.budget
+        matches = [prefix for prefix in self.budgets if model and model.startswith(prefix)]
+        return self.budgets[max(matches, key=len)] if matches else DEFAULT_TOKEN_BUDGET
+
+    def compact(self, messages: List[Any], model: str, reserve_tokens: Optional[int] = None) -> List[Any]:
+        """Returns the history fitted to the budget (the same list when it already fits)."""
+        reserve = self.reserve_tokens if reserve_tokens is None else reserve_tokens
+        budget = self.budget_for(model) - reserve
+        sizes = [message_tokens(m) for m in messages]
+        total = sum(sizes)
+        if total <= budget:
+            return messages
+
+        head_len = 0
+        while head_len < len(messages) and _field(messages[head_len], "role") == "system":
+            head_len += 1
+        head = []
+        for message, size in zip(messages[:head_len], sizes[:head_len]):
+            if message_text(message).startswith(SUMMARY_PREFIX):
+                total -= size  # Rebuilt below
+            else:
+                head.append(message)
+
+        # Group the rest into turns; the turns holding the last keep_recent messages are protected
+        turns, turn_sizes = [], []
+        for message, size in zip(messages[head_len:], sizes[head_len:]):
+            if not turns or is_turn_start(message):
+                turns.append([])
+                turn_sizes.append(0)
+            turns[-1].append(message)
+            turn_sizes[-1] += size
+        protected, seen = len(turns), 0
+        while protected > 0 and (seen < self.keep_recent or protected == len(turns)):
+            protected -= 1
+            seen += len(turns[protected])
+
+        # First pass: shrink old tool results
+        for t in range(protected):
+            for i, message in enumerate(turns[t]):
+                if _is_tool_result(message) and len(message_text(message)) > self.tool_result_chars:
+                    shrunk = self._shrink(message)
+                    delta = message_tokens(message) - message_tokens(shrunk)
+                    turns[t][i] = shrunk
+                    turn_sizes[t] -= delta
+                    total -= delta
+        # Second pass: drop the oldest turns. The rebuilt summary message counts
+        # against the budget too, so more turns are dropped while it does not fit
+        dropped, first_kept = [], 0
+        summary, summary_message, summary_size = self.summary, None, 0
+        while True:
+            while total + summary_size > budget and first_kept < protected:
+                dropped.extend(turns[first_kept])
+                total -= turn_sizes[first_kept]
+                first_kept += 1
+            if dropped and self.summarizer is not None:
+                summary = self.summarizer(self.summary, dropped)
+            if summary and self.summary_role:
+                summary_message = _new_message(messages, self.summary_role, SUMMARY_PREFIX + summary)
+                summary_size = message_tokens(summary_message)
+            if total + summary_size <= budget or first_kept >= protected:
+                break
+        self.summary = summary
+
+        result = list(head)
+        if summary_message is not None:
+            result.append(summary_message)
+        for turn in turns[first_kept:]:
+            result.extend(turn)
+        return result
+
+    def _shrink(self, message: Any) -> Any:
+        text = message_text(message)
+        cut = f"{text[:self.tool_result_chars]}\n... [truncado: {len(text) - self.tool_result_chars} caracteres]"
+        if not isinstance(message, dict):
+            # Message-like models (e.g. src.ai.Message): a copy of the same type, tool_call_id included
+            return message.model_copy(update={_text_field(message): cut})
+        shrunk = dict(message)
+        content = shrunk.get("content")
+        if isinstance(content, list):
+            blocks = []
+            for block in content:
+                if _field(block, "type") == "tool_result":
+                    block = {**block, "content": cut}
+                elif _field(block, "type") == "text":
+                    block = {**block, "text": cut}
+                blocks.append(block)
+            shrunk["content"] = blocks
+        else:
+            shrunk["content"] = cut
+        return shrunk
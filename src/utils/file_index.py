@@ -0,0 +1,137 @@
+# src/utils/file_index.py
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# A directory modified this recently may change again within the same mtime
+# tick, so it is scanned again on the next refresh instead of trusted
+RACY_WINDOW_NS = 2_000_000_000
+
+
+class _Dir:
+    __slots__ = ("mtime", "subdirs", "walk_subdirs", "files")
+
+    def __init__(self, mtime: Optional[int], subdirs: List[str], walk_subdirs: List[str], files: List[str]):
+        self.mtime = mtime  # None: scan again on the next refresh
+        self.subdirs = subdirs  # Like os.walk's dirnames (symlinks to directories included)
+        self.walk_subdirs = walk_subdirs  # The ones walked into (no symlinks, as os.walk by default)
+        self.files = files
+
+
+class FileIndex:
+    """
+    In-memory listing of the files under a directory.
+
+    The first refresh() reads every directory with os.scandir; later ones
+    stat each known directory and only scan again those whose mtime changed
+    (an entry was added, removed or renamed in it). Queries are answered from
+    memory, in os.walk's top-down order.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self._dirs: Dict[str, _Dir] = {}  # Relative path ("" for the root) -> entry
+        self._files: Optional[List[str]] = None  # Relative file paths, built on demand
+        self._extensions: Optional[Dict[str, List[str]]] = None
+        self._lock = threading.RLock()
+        self.scans = 0  # Directories read with scandir so far
+
+    def _scan(self, path: str, mtime: int) -> _Dir:
+        subdirs, walk_subdirs, files = [], [], []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    subdirs.append(entry.name)
+                    if not entry.is_symlink():
+                        walk_subdirs.append(entry.name)
+                else:
+                    files.append(entry.name)
+        self.scans += 1
+        racy = time.time_ns() - mtime < RACY_WINDOW_NS
+        return _Dir(None if racy else mtime, subdirs, walk_subdirs, files)
+
+    def refresh(self) -> bool:
+        """Brings the index up to date; returns whether anything changed."""
+        with self._lock:
+            changed = False
+            seen = set()
+            stack = [""]
+            while stack:
+                rel = stack.pop()
+                path = os.path.join(self.root, rel) if rel else self.root
+                entry = self._dirs.get(rel)
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                    if entry is None or entry.mtime != mtime:
+                        entry = self._scan(path, mtime)
+                        self._dirs[rel] = entry
+                        changed = True
+                except OSError:  # Removed meanwhile or unreadable: skipped, as os.walk does
+                    continue
+                seen.add(rel)
+                stack.extend(os.path.join(rel, name) if rel else name for name in reversed(entry.walk_subdirs))
+            for rel in self._dirs.keys() - seen:
+                del self._dirs[rel]
+                changed = True
+            if changed:
+                self._files = None
+                self._extensions = None
+            return changed
+
+    def walk(self) -> List[Tuple[str, List[str], List[str]]]:
+        """(dirpath, dirnames, filenames) like os.walk(root), from memory."""
+        result = []
+        with self._lock:
+            stack = [""]
+            while stack:
+                rel = stack.pop()
+                entry = self._dirs.get(rel)
+                if entry is None:
+                    continue
+                result.append(((os.path.join(self.root, rel) if rel else self.root), list(entry.subdirs), list(entry.files)))
+                stack.extend(os.path.join(rel, name) if rel else name for name in reversed(entry.walk_subdirs))
+        return result
+
+    def files(self) -> List[str]:
+        """Paths of all files, relative to the root."""
+        with self._lock:
+            if self._files is None:
+                self._files = [os.path.relpath(os.path.join(dirpath, name), self.root)
+                               for dirpath, _, names in self.walk() for name in names]
+            return list(self._files)
+
+    def by_extension(self, extension: str) -> List[str]:
+        """Relative paths of the files with that extension (e.g. ".py")."""
+        with self._lock:
+            if self._extensions is None:
+                self._extensions = {}
+                for path in self.files():
+                    self._extensions.setdefault(os.path.splitext(path)[1].lower(), []).append(path)
+            return list(self._extensions.get(extension.lower(), []))
+
+    def exists(self, relative_path: str) -> bool:
+        """Whether a file is in the index (as of the last refresh)."""
+        directory, name = os.path.split(os.path.normpath(relative_path))
+        entry = self._dirs.get("" if directory in ("", ".") else directory)
+        return entry is not None and name in entry.files
+
+
+_indexes: Dict[str, FileIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_file_index(root: str, refresh: bool = True) -> FileIndex:
+    """Shared index of a directory, refreshed (incrementally) before it is returned."""
+    key = os.path.realpath(root)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = FileIndex(root)
+    if refresh:
+        index.refresh()
+    return index
@@ -0,0 +1,98 @@
+# src/utils/file_view.py
+import mmap
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple
+
+MAX_INDEXED_FILES = 64  # Line indexes kept in memory (least recently used are dropped)
+
+
+class LineIndex:
+    """Byte offset where every line of a file starts, for the file's current (mtime, size)."""
+
+    def __init__(self, path: str, stamp: Tuple[int, int], offsets: array, size: int):
+        self.path = path
+        self.stamp = stamp
+        self.offsets = offsets
+        self.size = size
+
+    @property
+    def line_count(self) -> int:
+        return len(self.offsets)
+
+    def span(self, start: int, end: int) -> Tuple[int, int]:
+        """Byte range of lines start..end (1-based, inclusive)."""
+        return self.offsets[start - 1], self.offsets[end] if end < len(self.offsets) else self.size
+
+
+_indexes: "OrderedDict[str, LineIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _stamp(st: os.stat_result) -> Tuple[int, int]:
+    return st.st_mtime_ns, st.st_size
+
+
+def _build_index(path: str, stamp: Tuple[int, int]) -> LineIndex:
+    offsets = array("Q")
+    size = stamp[1]
+    if size:
+        offsets.append(0)
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            find = mm.find
+            pos = find(b"\n")
+            while pos != -1 and pos + 1 < size:
+                offsets.append(pos + 1)
+                pos = find(b"\n", pos + 1)
+    return LineIndex(path, stamp, offsets, size)
+
+
+def line_index(path: str) -> LineIndex:
+    """Line index of a file, rebuilt only when its modification time or size changed."""
+    key = os.path.abspath(path)
+    stamp = _stamp(os.stat(key))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None and index.stamp == stamp:
+            _indexes.move_to_end(key)
+            return index
+    index = _build_index(key, stamp)
+    with _indexes_lock:
+        _indexes[key] = index
+        _indexes.move_to_end(key)
+        while len(_indexes) > MAX_INDEXED_FILES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def read_lines(path: str, start: int = 1, end: Optional[int] = None) -> Tuple[int, list]:
+    """
+    Lines start..end (1-based, inclusive; end None or -1 = last line) of a
+    UTF-8 file, read through mmap so only that byte range is touched.
+    Returns (first line number, lines with their line breaks).
+    """
+    index = line_index(path)
+    total = index.line_count
+    start = max(1, start)
+    end = total if end is None or end < 0 else min(end, total)
+    if start > end:
+        return start, []
+    begin, stop = index.span(start, end)
+    with open(index.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        text = mm[begin:stop].decode("utf-8")
+    # Split on "\n" only, as the index counts lines: str.splitlines() would also
+    # break on \r, \x0c, \u2028... and shift the numbering against it
+    *complete, last = text.replace("\r\n", "\n").split("\n")
+    lines = [line + "\n" for line in complete]
+    if last:
+        lines.append(last)  # Last line of the file, without a line break
+    return start, lines
+
+
+def view_file(path: str, view_range: Optional[Sequence[int]] = None) -> str:
+    """File contents with "N: " line numbers, optionally only view_range [start, end]."""
+    start, end = (view_range[0], view_range[1]) if view_range else (1, None)
+    first, lines = read_lines(path, start, end)
+    return "".join([f"{first + i}: {line}" for i, line in enumerate(lines)])
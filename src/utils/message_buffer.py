@@ -0,0 +1,90 @@
+# src/utils/message_buffer.py
+import hashlib
+import json
+from typing import Any, Dict, Iterable, Iterator, List
+
+
+def encode_json(obj: Any) -> bytes:
+    """Compact JSON as sent on the wire."""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class MessageBuffer:
+    """
+    Conversation history that keeps every message already encoded as JSON.
+
+    A message is encoded once, when it is appended; request bodies are then
+    built by joining the stored segments instead of re-serializing the whole
+    history on every turn. Reads (iteration, indexing, slicing) see the plain
+    message dicts, so it can stand in for the list providers used before.
+    Messages must not be modified in place once appended.
+    """
+
+    def __init__(self, messages: Iterable[Dict[str, Any]] = ()):
+        self._messages: List[Dict[str, Any]] = []
+        self._segments: List[bytes] = []
+        self._hash = hashlib.sha256()  # Running hash of the segments, for digest()
+        self.extend(messages)
+
+    def _push(self, message: Dict[str, Any], segment: bytes):
+        self._messages.append(message)
+        self._segments.append(segment)
+        self._hash.update(segment)
+        self._hash.update(b"\n")
+
+    def append(self, message: Dict[str, Any]):
+        self._push(message, encode_json(message))
+
+    def extend(self, messages: Iterable[Dict[str, Any]]):
+        for message in messages:
+            self.append(message)
+
+    def copy(self) -> "MessageBuffer":
+        clone = MessageBuffer()
+        clone._messages = list(self._messages)
+        clone._segments = list(self._segments)
+        clone._hash = self._hash.copy()
+        return clone
+
+    def replace(self, messages: List[Dict[str, Any]]) -> "MessageBuffer":
+        """
+        Buffer holding `messages` (e.g. the history after compaction); messages
+        already present in this buffer keep their encoding.
+        """
+        if messages is self:
+            return self
+        encoded = {id(m): segment for m, segment in zip(self._messages, self._segments)}
+        clone = MessageBuffer()
+        for message in messages:
+            segment = encoded.get(id(message))
+            clone._push(message, segment if segment is not None else encode_json(message))
+        return clone
+
+    def digest(self) -> str:
+        """Hash of the encoded history, kept up to date as messages are appended."""
+        return self._hash.copy().hexdigest()
+
+    def request_body(self, **fields: Any) -> bytes:
+        """JSON request body with `messages` taken from the buffer and the other fields encoded now."""
+        head = encode_json(fields)
+        messages = b'"messages":[' + b",".join(self._segments) + b"]"
+        if head == b"{}":
+            return b"{" + messages + b"}"
+        return head[:-1] + b"," + messages + b"}"
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._messages)
+
+    def __getitem__(self, index):
+        return self._messages[index]  # A slice is a plain list
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, MessageBuffer):
+            return self._messages == other._messages
+        return self._messages == other
+
+    def __repr__(self) -> str:
+        return f"MessageBuffer({self._messages!r})"
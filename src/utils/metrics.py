@@ -0,0 +1,263 @@
+# src/utils/metrics.py
+import contextvars
+import json
+import os
+import threading
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+from pydantic import BaseModel
+
+from src.utils.printer import Printer
+
+printer = Printer(identifier="METRICS")
+
+
+class CallMetrics(BaseModel):
+    """What happened during one complete() / stream() call. Times are in seconds."""
+    provider: str
+    model: str
+    call: Literal["complete", "stream"]
+    started_at: float  # Unix time
+    queue_time: float = 0.0  # Waiting for the rate limiter
+    ttft: Optional[float] = None  # Time to first token (streams)
+    latency: float = 0.0
+    requests: int = 0  # API requests made (tool rounds make several)
+    retries: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    tokens_estimated: bool = False  # The API reported no usage; counts are estimates
+    tokens_per_second: Optional[float] = None  # Completion tokens over generation time
+    tool_calls: int = 0
+    tool_time: float = 0.0  # Sum of tool execution times (tools may overlap)
+    cached: bool = False
+    error: Optional[str] = None
+
+
+_current_call: contextvars.ContextVar[Optional[CallMetrics]] = contextvars.ContextVar("current_call", default=None)
+
+
+def current_call() -> Optional[CallMetrics]:
+    """Record of the provider call running in this context, if metrics are enabled."""
+    return _current_call.get()
+
+
+def set_current_call(record: Optional[CallMetrics]):
+    return _current_call.set(record) if record is not None else None
+
+
+def reset_current_call(token):
+    if token is not None:
+        _current_call.reset(token)
+
+
+def usage_tokens(response: Any) -> Optional[Tuple[int, int]]:
+    """(prompt, completion) tokens reported in an SDK response, a chunk or a JSON dict."""
+    if isinstance(response, dict):
+        usage = response.get("usage") or {}
+        if usage:
+            return usage.get("prompt_tokens") or 0, usage.get("completion_tokens") or 0
+        return None
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
+    usage = getattr(response, "usage_metadata", None)  # Gemini
+    if usage is not None:
+        return getattr(usage, "prompt_token_count", 0) or 0, getattr(usage, "candidates_token_count", 0) or 0
+    return None
+
+
+class MetricsSink:
+    """Receives a CallMetrics for every finished call."""
+
+    def record(self, metrics: CallMetrics):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class MetricsAggregator(MetricsSink):
+    """In-process totals and latency percentiles per (provider, model)."""
+
+    def __init__(self, window: int = 1000):
+        self.window = window  # Recent calls kept for percentiles
+        self._totals: Dict[Tuple[str, str], Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self._latencies: Dict[Tuple[str, str], deque] = defaultdict(lambda: deque(maxlen=self.window))
+        self._ttfts: Dict[Tuple[str, str], deque] = defaultdict(lambda: deque(maxlen=self.window))
+
+    def record(self, metrics: CallMetrics):
+        key = (metrics.provider, metrics.model)
+        totals = self._totals[key]
+        totals["calls"] += 1
+        totals["errors"] += metrics.error is not None
+        totals["cached"] += metrics.cached
+        for field in ("requests", "retries", "queue_time", "latency", "prompt_tokens",
+                      "completion_tokens", "tool_calls", "tool_time"):
+            totals[field] += getattr(metrics, field)
+        self._latencies[key].append(metrics.latency)
+        if metrics.ttft is not None:
+            self._ttfts[key].append(metrics.ttft)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per "provider/model": totals, mean queue and tool time, p50/p95/p99 latency and TTFT."""
+        result = {}
+        for key, totals in self._totals.items():
+            latencies = sorted(self._latencies[key])
+            ttfts = sorted(self._ttfts[key])
+            calls = totals["calls"]
+            result["/".join(key)] = {
+                **{field: totals[field] for field in ("calls", "errors", "cached", "requests", "retries",
+                                                     "prompt_tokens", "completion_tokens", "tool_calls")},
+                "mean_queue_time": totals["queue_time"] / calls,
+                "mean_tool_time": totals["tool_time"] / calls,
+                "latency_p50": _percentile(latencies, 0.50),
+                "latency_p95": _percentile(latencies, 0.95),
+                "latency_p99": _percentile(latencies, 0.99),
+                "ttft_p50": _percentile(ttfts, 0.50),
+                "ttft_p95": _percentile(ttfts, 0.95),
+                "tokens_per_second": totals["completion_tokens"] / totals["latency"] if totals["latency"] else None,
+            }
+        return result
+
+
+class JSONLSink(MetricsSink):
+    """Appends one JSON line per call to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, metrics: CallMetrics):
+        self._file.write(json.dumps(metrics.model_dump(), ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class PrometheusSink(MetricsSink):
+    """
+    Counters and histograms in the Prometheus text format. render() returns the
+    exposition text; serve() exposes it on http://host:port/metrics.
+    """
+
+    BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+    HISTOGRAMS = {
+        "latency": "llm_call_latency_seconds",
+        "ttft": "llm_call_ttft_seconds",
+        "queue_time": "llm_call_queue_seconds",
+        "tool_time": "llm_call_tool_seconds",
+    }
+    COUNTERS = {
+        "calls": "llm_calls_total",
+        "errors": "llm_call_errors_total",
+        "requests": "llm_requests_total",
+        "retries": "llm_retries_total",
+        "prompt_tokens": "llm_prompt_tokens_total",
+        "completion_tokens": "llm_completion_tokens_total",
+        "tool_calls": "llm_tool_calls_total",
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()  # serve() reads from another thread
+        self._counters: Dict[Tuple[str, str, str], float] = defaultdict(float)
+        self._histograms: Dict[Tuple[str, str, str], List[float]] = {}  # Bucket counts, then sum and count
+        self._server = None
+
+    def record(self, metrics: CallMetrics):
+        labels = (metrics.provider, metrics.model)
+        values = {
+            "calls": 1,
+            "errors": metrics.error is not None,
+            "requests": metrics.requests,
+            "retries": metrics.retries,
+            "prompt_tokens": metrics.prompt_tokens,
+            "completion_tokens": metrics.completion_tokens,
+            "tool_calls": metrics.tool_calls,
+        }
+        with self._lock:
+            for field, value in values.items():
+                self._counters[(field, *labels)] += value
+            for field in self.HISTOGRAMS:
+                value = getattr(metrics, field)
+                if value is None:
+                    continue
+                histogram = self._histograms.setdefault((field, *labels), [0] * (len(self.BUCKETS) + 2))
+                for i, bound in enumerate(self.BUCKETS):
+                    if value <= bound:
+                        histogram[i] += 1
+                histogram[-2] += value
+                histogram[-1] += 1
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for field, name in self.COUNTERS.items():
+                lines.append(f"# TYPE {name} counter")
+                for (f, provider, model), value in self._counters.items():
+                    if f == field:
+                        lines.append(f'{name}{{provider="{_label(provider)}",model="{_label(model)}"}} {value:g}')
+            for field, name in self.HISTOGRAMS.items():
+                lines.append(f"# TYPE {name} histogram")
+                for (f, provider, model), histogram in self._histograms.items():
+                    if f != field:
+                        continue
+                    labels = f'provider="{_label(provider)}",model="{_label(model)}"'
+                    for bound, count in zip(self.BUCKETS, histogram):
+                        lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {count}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram[-1]}')
+                    lines.append(f"{name}_sum{{{labels}}} {histogram[-2]:g}")
+                    lines.append(f"{name}_count{{{labels}}} {histogram[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, host: str = "127.0.0.1", port: int = 9464) -> ThreadingHTTPServer:
+        """Serves /metrics from a daemon thread; returns the server (port 0 picks a free one)."""
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = sink.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def emit(sinks: List[MetricsSink], metrics: CallMetrics):
+    """Hands a record to every sink; a failing sink never breaks the call."""
+    for sink in sinks:
+        try:
+            sink.record(metrics)
+        except Exception as e:
+            printer.yellow(f"Error en el sink de métricas {type(sink).__name__}: {str(e)}")
@@ -0,0 +1,155 @@
+# src/utils/multi_edit.py
+import os
+import re
+import shutil
+import tempfile
+from bisect import bisect_right
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# JSON schema of the "edits" argument, shared by the agents' multi_edit tools
+EDITS_SCHEMA = {
+    "type": "array",
+    "description": "Ediciones, todas relativas al contenido actual del archivo: "
+                   "{\"old_str\", \"new_str\"} reemplaza un texto que aparece exactamente una vez; "
+                   "{\"insert_line\", \"new_str\"} inserta después de esa línea (0 = al principio).",
+    "items": {
+        "type": "object",
+        "properties": {
+            "old_str": {"type": "string"},
+            "new_str": {"type": "string"},
+            "insert_line": {"type": "integer"},
+        },
+        "required": ["new_str"],
+    },
+}
+
+
+class EditError(ValueError):
+    """An edit of a multi_edit batch cannot be applied; the file is left untouched."""
+
+
+def _line_starts(content: str) -> List[int]:
+    """Offset where each line starts, plus len(content) as the end of the last line."""
+    starts = [0]
+    pos = content.find("\n")
+    while pos != -1:
+        starts.append(pos + 1)
+        pos = content.find("\n", pos + 1)
+    if starts[-1] != len(content):
+        starts.append(len(content))
+    return starts
+
+
+def _find_anchors(content: str, anchors: List[str]) -> Dict[str, List[int]]:
+    """Offsets of every occurrence (overlapping ones included) of each anchor, found in one scan of content."""
+    unique = sorted(set(anchors), key=len, reverse=True)  # At a given offset the longest anchor matches...
+    prefixes = {a: [b for b in unique if b != a and a.startswith(b)] for a in unique}  # ...and these too
+    pattern = re.compile("(?=(" + "|".join(map(re.escape, unique)) + "))")
+    positions: Dict[str, List[int]] = {a: [] for a in unique}
+    for match in pattern.finditer(content):
+        anchor = match.group(1)
+        positions[anchor].append(match.start())
+        for prefix in prefixes[anchor]:
+            positions[prefix].append(match.start())
+    return positions
+
+
+def apply_edits(content: str, edits: List[Dict[str, Any]], insert_before: bool = False) -> str:
+    """
+    Applies every edit to content in a single pass and returns the result.
+    Anchors (old_str, insert_line) all refer to the original content, so edits
+    do not shift each other; every old_str is located in one scan. An
+    insert_line N inserts after line N (0 = at the top) or, with
+    insert_before, before line N (N = line count + 1 appends). Raises
+    EditError, changing nothing, when an old_str is missing or ambiguous, a
+    line is out of range, or edits overlap.
+    """
+    for i, edit in enumerate(edits, 1):
+        if not isinstance(edit.get("new_str"), str):
+            raise EditError(f"Edición {i}: falta 'new_str'")
+        if edit.get("old_str") is not None and not edit["old_str"]:
+            raise EditError(f"Edición {i}: 'old_str' está vacío")
+    anchors = [edit["old_str"] for edit in edits if edit.get("old_str") is not None]
+    positions = _find_anchors(content, anchors) if anchors else {}
+
+    operations: List[Tuple[int, int, int, str]] = []  # (start, end, order, text); inserts have start == end
+    line_starts = None
+    for i, edit in enumerate(edits, 1):
+        new_str = edit["new_str"]
+        if edit.get("old_str") is not None:
+            old_str = edit["old_str"]
+            found = positions[old_str]
+            if not found:
+                raise EditError(f"Edición {i}: 'old_str' no aparece en el archivo")
+            if len(found) > 1:
+                raise EditError(f"Edición {i}: 'old_str' aparece más de una vez")
+            operations.append((found[0], found[0] + len(old_str), i, new_str))
+        elif edit.get("insert_line") is not None:
+            if line_starts is None:
+                line_starts = _line_starts(content)
+            line = int(edit["insert_line"])
+            lines = len(line_starts) - 1
+            first = 1 if insert_before else 0
+            if not first <= line <= lines + first:
+                raise EditError(f"Edición {i}: la línea {line} está fuera de rango ({lines} líneas)")
+            text = new_str if new_str.endswith("\n") else new_str + "\n"
+            position = line_starts[line - first]
+            if position == len(content) and content and not content.endswith("\n"):
+                text = "\n" + text  # After a last line without line break
+            operations.append((position, position, i, text))
+        else:
+            raise EditError(f"Edición {i}: se necesita 'old_str' o 'insert_line'")
+
+    operations.sort()
+    replaced = [(start, end, order) for start, end, order, _ in operations if end > start]
+    ends = [end for _, end, _ in replaced]
+    for previous, current in zip(replaced, replaced[1:]):
+        if current[0] < previous[1]:
+            raise EditError(f"Las ediciones {previous[2]} y {current[2]} se solapan")
+    for start, end, order, _ in operations:
+        if start == end:
+            k = bisect_right(ends, start)  # First replacement ending after the insert point
+            if k < len(replaced) and replaced[k][0] < start:
+                raise EditError(f"Edición {order}: inserta dentro del texto reemplazado por la edición {replaced[k][2]}")
+
+    pieces, cursor = [], 0
+    for start, end, _, text in operations:
+        pieces.append(content[cursor:start])
+        pieces.append(text)
+        cursor = end
+    pieces.append(content[cursor:])
+    return "".join(pieces)
+
+
+def write_atomic(path: str, content: str):
+    """Writes through a temporary file in the same directory, renamed over path (the target, for a symlink)."""
+    path = os.path.realpath(path)  # Replacing a symlink itself would turn it into a regular file
+    directory = os.path.dirname(path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".multi_edit-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def multi_edit_file(path: str, edits: List[Dict[str, Any]],
+                    before_write: Optional[Callable[[str], None]] = None, insert_before: bool = False) -> int:
+    """
+    Applies a batch of edits to a file: one read, one pass, one atomic write.
+    before_write(path) runs once the edits are known to apply (e.g. to record
+    an undo level); insert_before is passed to apply_edits. Returns the number
+    of edits applied.
+    """
+    if not edits:
+        raise EditError("No hay ediciones")
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    new_content = apply_edits(content, edits, insert_before)
+    if before_write is not None:
+        before_write(path)
+    write_atomic(path, new_content)
+    return len(edits)
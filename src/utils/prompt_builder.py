@@ -0,0 +1,80 @@
+# src/utils/prompt_builder.py
+from typing import Any, Callable, Dict, List, Optional
+
+OMITTED_NOTE = "[... {count} mensajes anteriores omitidos ...]\n"
+
+
+def render_turn(message: Dict[str, Any]) -> str:
+    """One history line as DeepSeekAgent sends it: "Usuario: ..." / "Asistente: ..."."""
+    role = "Usuario" if message["role"] == "user" else "Asistente"
+    return f"{role}: {message['content']}\n"
+
+
+class PromptBuilder:
+    """
+    Builds the single-string prompt (system prompt + history) sent to text-only
+    chat endpoints, incrementally.
+
+    Each message is rendered once and the last prompt is kept; a call only
+    renders and appends the turns added since the previous one. With
+    max_chars, the oldest turns are dropped to stay within the budget. The
+    window is then cut to `refill` of the budget so that the following turns
+    append again instead of re-joining the whole window every time.
+    """
+
+    def __init__(self, system_prompt: str, max_chars: Optional[int] = None, refill: float = 0.75,
+                 render: Callable[[Dict[str, Any]], str] = render_turn):
+        self.system_prompt = system_prompt
+        self.max_chars = max_chars
+        self.refill = refill
+        self.render = render
+        self.reset()
+
+    def reset(self):
+        self._lines: List[str] = []  # Rendered history, one entry per message
+        self._last: Optional[Dict[str, Any]] = None  # Last message rendered, to detect rewritten histories
+        self._start = 0  # First message inside the window
+        self._window_chars = 0  # Characters of _lines[_start:]
+        self._prompt = ""
+
+    def build(self, history: List[Dict[str, Any]]) -> str:
+        """Prompt for the given history, which is expected to only grow between calls."""
+        rendered = len(self._lines)
+        if rendered > len(history) or (rendered and history[rendered - 1] is not self._last):
+            self.reset()  # History was replaced or edited: start over
+            rendered = 0
+        if rendered == len(history) and self._prompt:
+            return self._prompt
+
+        new_lines = [self.render(message) for message in history[rendered:]]
+        self._lines.extend(new_lines)
+        if history:
+            self._last = history[-1]
+        added = sum(len(line) for line in new_lines)
+        self._window_chars += added
+
+        if self.max_chars is not None and self._header_chars() + self._window_chars > self.max_chars:
+            self._shrink_window(int(self.max_chars * self.refill))
+            self._prompt = self._header() + "".join(self._lines[self._start:])
+        elif self._prompt:
+            self._prompt += "".join(new_lines)
+        else:
+            self._prompt = self._header() + "".join(self._lines[self._start:])
+        return self._prompt
+
+    def _header(self) -> str:
+        header = self.system_prompt + "\n\n"
+        if self._start:
+            header += OMITTED_NOTE.format(count=self._start)
+        return header
+
+    def _header_chars(self) -> int:
+        note = len(OMITTED_NOTE.format(count=self._start)) if self._start else 0
+        return len(self.system_prompt) + 2 + note
+
+    def _shrink_window(self, target: int):
+        # The most recent message is always kept, even if it alone exceeds the budget
+        while self._start < len(self._lines) - 1 and self._header_chars() + self._window_chars > target:
+            self._window_chars -= len(self._lines[self._start])
+            self._lines[self._start] = ""  # Never sent again; only its position matters
+            self._start += 1
@@ -0,0 +1,230 @@
+# src/utils/ratelimit.py
+import asyncio
+import email.utils
+import hashlib
+import random
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from src.utils.printer import Printer
+
+printer = Printer(identifier="RATE")
+
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def error_status(exc: BaseException) -> Optional[int]:
+    """HTTP status of an SDK (openai/groq/mistral) or aiohttp error, if it carries one."""
+    for attr in ("status_code", "status"):
+        status = getattr(exc, attr, None)
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds requested by the server through Retry-After / retry-after-ms headers."""
+    headers = getattr(exc, "headers", None) or getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)  # HTTP-date form
+        return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = error_status(exc)
+    if status is not None:
+        return status in RETRY_STATUSES
+    name = type(exc).__name__
+    return isinstance(exc, (asyncio.TimeoutError, ConnectionError)) or name.endswith(("ConnectionError", "TimeoutError"))
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute up to `capacity`; waiters are served in order."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        amount = min(amount, self.capacity)  # A single huge request must not wait forever
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit: grows by one after `limit` consecutive successes,
+    halves when the provider throttles us.
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 64):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.maximum:
+            self.limit += 1
+            self._successes = 0
+
+    def on_throttle(self):
+        self.limit = max(self.minimum, self.limit // 2)
+        self._successes = 0
+
+
+class RateLimiter:
+    """
+    Governs the requests sent to one provider account: request and token
+    buckets (per minute), an adaptive concurrency limit, and retries with
+    jittered exponential backoff that honour Retry-After.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 request_burst: Optional[float] = None, token_burst: Optional[float] = None,
+                 initial_concurrency: int = 4, min_concurrency: int = 1, max_concurrency: int = 64,
+                 max_retries: int = 5, base_delay: float = 0.5, max_delay: float = 60.0):
+        # Bursts default to a full minute of quota; lower them for providers that enforce per-second windows
+        self.requests = TokenBucket(requests_per_minute, request_burst) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, token_burst) if tokens_per_minute else None
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, min_concurrency, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.blocked_until = 0.0  # Set by a 429: every caller waits, not just the one that got it
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def _acquire(self, tokens: int):
+        pause = self.blocked_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+        if self.requests:
+            await self.requests.acquire(1)
+        if self.tokens and tokens:
+            await self.tokens.acquire(tokens)
+        await self.concurrency.acquire()
+
+    async def _retry_delay(self, exc: BaseException, attempt: int) -> Optional[float]:
+        """Delay before the next attempt, or None when the error must propagate."""
+        if attempt >= self.max_retries or not is_retryable(exc):
+            return None
+        delay = retry_after(exc)
+        if error_status(exc) == 429:
+            self.concurrency.on_throttle()
+            delay = delay if delay is not None else self.backoff(attempt)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+        elif delay is None:
+            delay = self.backoff(attempt)
+        printer.yellow(f"Reintento {attempt + 1}/{self.max_retries} en {delay:.2f}s: {exc}")
+        return delay
+
+    async def call(self, make_request: Callable[[], Awaitable[Any]], tokens: int = 0,
+                   stats: Optional[Dict[str, float]] = None) -> Any:
+        """Runs make_request() under the limits, retrying throttled and transient failures."""
+        attempt = 0
+        while True:
+            queued = time.perf_counter()
+            await self._acquire(tokens)
+            if stats is not None:
+                stats["queue_time"] = stats.get("queue_time", 0.0) + time.perf_counter() - queued
+            try:
+                result = await make_request()
+            except Exception as e:
+                await self.concurrency.release()
+                delay = await self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                if stats is not None:
+                    stats["retries"] = stats.get("retries", 0) + 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                await self.concurrency.release()
+                raise
+            self.concurrency.on_success()
+            await self.concurrency.release()
+            return result
+
+    async def stream(self, open_stream: Callable[[], AsyncIterator[Any]], tokens: int = 0,
+                     stats: Optional[Dict[str, float]] = None) -> AsyncIterator[Any]:
+        """Like call() for streams; a stream is only retried if it failed before its first item."""
+        attempt = 0
+        while True:
+            queued = time.perf_counter()
+            await self._acquire(tokens)
+            if stats is not None:
+                stats["queue_time"] = stats.get("queue_time", 0.0) + time.perf_counter() - queued
+            started = False
+            released = False
+            try:
+                async for item in open_stream():
+                    started = True
+                    yield item
+                self.concurrency.on_success()
+                return
+            except Exception as e:
+                await self.concurrency.release()
+                released = True
+                delay = None if started else await self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                if stats is not None:
+                    stats["retries"] = stats.get("retries", 0) + 1
+                await asyncio.sleep(delay)
+            finally:
+                if not released:
+                    await self.concurrency.release()
+
+
+_limiters: Dict[str, RateLimiter] = {}
+
+
+def get_rate_limiter(provider_name: str, api_key: str, **limits) -> RateLimiter:
+    """Shared limiter per provider account, so parallel sessions draw from the same budget."""
+    key = f"{provider_name}:{hashlib.sha256((api_key or '').encode()).hexdigest()[:16]}"
+    if key not in _limiters:
+        _limiters[key] = RateLimiter(**limits)
+    return _limiters[key]
@@ -0,0 +1,205 @@
+# src/utils/session_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Iterable, List, Optional
+
+DEFAULT_DB_PATH = os.path.join(".sessions", "sessions.db")
+INTERRUPTED_TOOL_RESULT = "Error: la sesión se interrumpió antes de obtener el resultado de esta herramienta."
+
+
+def _encode(obj: Any) -> Any:
+    """JSON fallback for SDK objects found in histories (e.g. anthropic content blocks)."""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(exclude_none=True)
+    return str(obj)
+
+
+def encode_message(message: Any) -> str:
+    return json.dumps(message, ensure_ascii=False, default=_encode)
+
+
+class SessionStore:
+    """
+    Append-only log of conversation messages in SQLite.
+
+    Messages are keyed by (session_id, seq), so appending is a single indexed
+    insert and resuming reads only the tail of a session. The database runs in
+    WAL mode: every append is committed (durable across crashes) without
+    rewriting anything already stored.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                agent TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sessions_by_agent ON sessions (agent, updated_at);
+            CREATE TABLE IF NOT EXISTS messages (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            ) WITHOUT ROWID;
+        """)
+
+    def create_session(self, agent: str, session_id: Optional[str] = None) -> str:
+        session_id = session_id or uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO sessions (id, agent, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (session_id, agent, now, now),
+            )
+        return session_id
+
+    def latest_session(self, agent: str) -> Optional[str]:
+        """Most recently updated session of an agent."""
+        row = self._db.execute(
+            "SELECT id FROM sessions WHERE agent = ? ORDER BY updated_at DESC LIMIT 1", (agent,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def append(self, session_id: str, message: Any) -> int:
+        return self.append_many(session_id, [message])
+
+    def append_many(self, session_id: str, messages: Iterable[Any]) -> int:
+        """Stores messages at the end of a session in one transaction; returns the new length."""
+        encoded = [encode_message(message) for message in messages]
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                length = self.count(session_id)
+                self._db.executemany(
+                    "INSERT INTO messages (session_id, seq, created_at, data) VALUES (?, ?, ?, ?)",
+                    [(session_id, length + i, now, data) for i, data in enumerate(encoded)],
+                )
+                self._db.execute("UPDATE sessions SET updated_at = ? WHERE id = ?", (now, session_id))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return length + len(encoded)
+
+    def count(self, session_id: str) -> int:
+        row = self._db.execute("SELECT MAX(seq) FROM messages WHERE session_id = ?", (session_id,)).fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def tail(self, session_id: str, limit: int) -> List[Any]:
+        """The last `limit` messages of a session, oldest first."""
+        rows = self._db.execute(
+            "SELECT data FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?", (session_id, limit)
+        ).fetchall()
+        return [json.loads(data) for (data,) in reversed(rows)]
+
+    def load(self, session_id: str, start: int = 0) -> List[Any]:
+        """Messages of a session from position `start` on."""
+        rows = self._db.execute(
+            "SELECT data FROM messages WHERE session_id = ? AND seq >= ? ORDER BY seq", (session_id, start)
+        ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def close(self):
+        self._db.close()
+
+
+class PersistentHistory(list):
+    """
+    A conversation history (a plain list) that stores every message appended
+    to it. Other in-place changes, such as context compaction, only affect
+    memory: the store keeps the full log.
+    """
+
+    def __init__(self, store: SessionStore, session_id: str, messages: Iterable[Any] = ()):
+        super().__init__(messages)
+        self.store = store
+        self.session_id = session_id
+
+    def append(self, message: Any):
+        self.store.append(self.session_id, message)
+        super().append(message)
+
+    def extend(self, messages: Iterable[Any]):
+        messages = list(messages)
+        self.store.append_many(self.session_id, messages)
+        super().extend(messages)
+
+    def __iadd__(self, messages: Iterable[Any]):
+        self.extend(messages)
+        return self
+
+
+def _blocks(message: Any) -> List[Any]:
+    content = message.get("content") if isinstance(message, dict) else None
+    return [block for block in content if isinstance(block, dict)] if isinstance(content, list) else []
+
+
+def closing_tool_results(messages: List[Any]) -> List[Any]:
+    """
+    Error results for the tool calls of the last assistant message that were
+    never answered (the session stopped in the middle of a tool loop), in the
+    format of the calls: Anthropic tool_use blocks or OpenAI tool_calls. APIs
+    reject a history with unanswered calls, so these are appended on resume.
+    """
+    last = next((i for i in range(len(messages) - 1, -1, -1)
+                 if isinstance(messages[i], dict) and messages[i].get("role") == "assistant"), None)
+    if last is None:
+        return []
+    answered = set()
+    for message in messages[last + 1:]:
+        answered.update(block.get("tool_use_id") for block in _blocks(message) if block.get("type") == "tool_result")
+        if isinstance(message, dict) and message.get("role") == "tool":
+            answered.add(message.get("tool_call_id"))
+    blocks = [block["id"] for block in _blocks(messages[last]) if block.get("type") == "tool_use"]
+    calls = [call.get("id") for call in messages[last].get("tool_calls") or []]
+    missing_blocks = [call_id for call_id in blocks if call_id not in answered]
+    missing_calls = [call_id for call_id in calls if call_id not in answered]
+    closing = []
+    if missing_blocks:
+        closing.append({"role": "user", "content": [
+            {"type": "tool_result", "tool_use_id": call_id, "content": INTERRUPTED_TOOL_RESULT, "is_error": True}
+            for call_id in missing_blocks
+        ]})
+    closing.extend({"role": "tool", "tool_call_id": call_id, "content": INTERRUPTED_TOOL_RESULT}
+                   for call_id in missing_calls)
+    return closing
+
+
+def open_history(store: SessionStore, agent: str, session_id: Optional[str] = None, resume: bool = False,
+                 tail: int = 200, turn_start: Optional[Callable[[Any], bool]] = None) -> PersistentHistory:
+    """
+    History for an agent session. With resume=True, continues `session_id` (or
+    the agent's latest session) with its last `tail` messages loaded; when
+    turn_start is given, messages before the first turn start in that tail are
+    skipped so a tool result is never loaded without its call; tool calls left
+    unanswered at the end are closed with error results (see closing_tool_results).
+    """
+    if resume:
+        session_id = session_id or store.latest_session(agent)
+    if not resume or session_id is None:
+        return PersistentHistory(store, store.create_session(agent, session_id))
+    store.create_session(agent, session_id)  # No-op when it exists
+    messages = store.tail(session_id, tail)
+    if turn_start is not None:
+        first = next((i for i, message in enumerate(messages) if turn_start(message)), len(messages))
+        messages = messages[first:]
+    history = PersistentHistory(store, session_id, messages)
+    closing = closing_tool_results(messages)
+    if closing:
+        history.extend(closing)  # Stored too, so the log itself is valid from here on
+    return history
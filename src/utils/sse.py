@@ -0,0 +1,109 @@
+# src/utils/sse.py
+import codecs
+import json
+import re
+from typing import List, NamedTuple, Optional
+
+# SSE lines end in CRLF, LF or CR; str.splitlines would also break on \x0c, \u2028, etc.
+_LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+DONE = "[DONE]"
+
+
+class ServerSentEvent(NamedTuple):
+    event: str
+    data: str
+    id: Optional[str] = None
+
+
+class SSEDecoder:
+    """
+    Incremental Server-Sent Events parser.
+
+    Feed it raw network chunks in any size: multibyte characters, lines and
+    events may be split across chunk boundaries. Each byte is decoded once and
+    an unfinished line is kept as a list of fragments that is joined only when
+    its line break arrives.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._partial: List[str] = []  # Fragments of the current, unterminated line
+        self._pending_cr = False  # Last chunk ended in \r; a leading \n belongs to it
+        self._data: List[str] = []
+        self._event = ""
+        self._id: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> List[ServerSentEvent]:
+        """Consumes a chunk and returns the events it completed."""
+        return self._feed_text(self._decoder.decode(chunk))
+
+    def flush(self) -> List[ServerSentEvent]:
+        """Ends the stream, returning any event left without a trailing blank line."""
+        events = self._feed_text(self._decoder.decode(b"", final=True))
+        if self._partial:
+            line = "".join(self._partial)
+            self._partial = []
+            event = self._process_line(line)
+            if event:
+                events.append(event)
+        event = self._process_line("")
+        if event:
+            events.append(event)
+        return events
+
+    def _feed_text(self, text: str) -> List[ServerSentEvent]:
+        if not text:
+            return []
+        if self._pending_cr and text[0] == "\n":
+            text = text[1:]
+        self._pending_cr = text.endswith("\r")
+
+        events = []
+        lines = _LINE_BREAK.split(text)
+        tail = lines.pop()  # Text after the last line break (possibly empty)
+        for line in lines:
+            if self._partial:
+                self._partial.append(line)
+                line = "".join(self._partial)
+                self._partial = []
+            event = self._process_line(line)
+            if event:
+                events.append(event)
+        if tail:
+            self._partial.append(tail)
+        return events
+
+    def _process_line(self, line: str) -> Optional[ServerSentEvent]:
+        if not line:  # Blank line dispatches the event
+            if not self._data:
+                self._event = ""
+                return None
+            event = ServerSentEvent(self._event or "message", "\n".join(self._data), self._id)
+            self._data = []
+            self._event = ""
+            return event
+        if line[0] == ":":
+            return None  # Comment / keep-alive (e.g. ": OPENROUTER PROCESSING")
+        field, _, value = line.partition(":")
+        if value[:1] == " ":
+            value = value[1:]
+        if field == "data":
+            self._data.append(value)
+        elif field == "event":
+            self._event = value
+        elif field == "id":
+            self._id = value
+        return None
+
+
+def delta_content(data: str) -> str:
+    """Content token of an OpenAI-style chat.completion.chunk payload."""
+    payload = json.loads(data)
+    if "error" in payload:
+        error = payload["error"]
+        raise RuntimeError(error.get("message", str(error)) if isinstance(error, dict) else str(error))
+    choices = payload.get("choices") or []
+    if not choices:
+        return ""
+    return (choices[0].get("delta") or {}).get("content") or ""
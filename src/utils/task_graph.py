@@ -0,0 +1,148 @@
+# src/utils/task_graph.py
+import json
+import os
+import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from src.utils.printer import Printer
+
+printer = Printer(identifier="PLAN")
+
+PLAN_FORMAT = """Al final de tu respuesta, incluye el plan como un bloque ```json con una lista de tareas:
+[{"id": "t1", "description": "...", "files": ["ruta/archivo.py"], "depends_on": []}, ...]
+Cada tarea debe poder realizarse por separado; "depends_on" lista los ids de las tareas que deben terminar antes."""
+
+_JSON_BLOCK = re.compile(r"```(?:json)?\s*\n(.*?)```", re.DOTALL)
+
+
+class PlanTask(BaseModel):
+    """One file-level step of an architect's plan."""
+    id: str
+    description: str
+    files: List[str] = []
+    depends_on: List[str] = []
+
+
+class TaskSkipped(RuntimeError):
+    """A task was not run because a task it depends on failed."""
+
+
+def _plan_items(text: str) -> Optional[List[Dict[str, Any]]]:
+    for block in reversed(_JSON_BLOCK.findall(text)):
+        try:
+            data = json.loads(block)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(data, dict):
+            data = data.get("tasks")
+        if isinstance(data, list) and all(isinstance(item, dict) for item in data):
+            return data
+    return None
+
+
+def parse_plan(text: str) -> List[PlanTask]:
+    """
+    Tasks of a plan written in PLAN_FORMAT. A plan without a valid JSON task
+    list becomes a single task with the whole text, as it was run before.
+    """
+    items = _plan_items(text)
+    if not items:
+        return [PlanTask(id="t1", description=text)]
+    tasks = []
+    for i, item in enumerate(items, 1):
+        tasks.append(PlanTask(
+            id=str(item.get("id") or f"t{i}"),
+            description=str(item.get("description") or item.get("task") or ""),
+            files=[str(f) for f in item.get("files") or []],
+            depends_on=[str(d) for d in item.get("depends_on") or []],
+        ))
+    return check_plan(tasks)
+
+
+def check_plan(tasks: List[PlanTask]) -> List[PlanTask]:
+    """Drops unknown dependencies; raises ValueError on duplicate ids or cycles."""
+    ids = [task.id for task in tasks]
+    if len(set(ids)) != len(ids):
+        raise ValueError("El plan tiene tareas con el mismo id")
+    for task in tasks:
+        unknown = [d for d in task.depends_on if d not in ids]
+        if unknown:
+            printer.yellow(f"La tarea {task.id} depende de tareas inexistentes: {', '.join(unknown)}")
+            task.depends_on = [d for d in task.depends_on if d in ids]
+    # Kahn's algorithm: every task must become ready at some point
+    pending = {task.id: set(task.depends_on) for task in tasks}
+    while pending:
+        ready = [task_id for task_id, deps in pending.items() if not deps]
+        if not ready:
+            raise ValueError(f"El plan tiene dependencias circulares entre: {', '.join(pending)}")
+        for task_id in ready:
+            del pending[task_id]
+        for deps in pending.values():
+            deps.difference_update(ready)
+    return tasks
+
+
+def run_graph(tasks: List[PlanTask], run: Callable[[PlanTask], Any], max_workers: int = 4,
+              on_done: Optional[Callable[[PlanTask, Any], None]] = None) -> Dict[str, Any]:
+    """
+    Runs run(task) on a thread pool, each task as soon as all its dependencies
+    succeeded, at most max_workers at a time. Tasks that list a common file
+    never run at the same time (the later one in the plan sees the earlier
+    one's changes instead of overwriting them). Returns the result of each task
+    by id: the return value, the exception it raised, or TaskSkipped. on_done
+    is called from the calling thread as tasks finish, so it may print freely.
+    """
+    by_id = {task.id: task for task in tasks}
+    waiting = {task.id: set(task.depends_on) for task in tasks}
+    files = {task.id: {os.path.normcase(os.path.normpath(f)) for f in task.files} for task in tasks}
+    results: Dict[str, Any] = {}
+
+    def finish(task_id: str, result: Any):
+        results[task_id] = result
+        if on_done is not None:
+            on_done(by_id[task_id], result)
+        for other, deps in list(waiting.items()):
+            if other not in waiting or task_id not in deps:
+                continue  # Unrelated, or already skipped by the recursion below
+            if isinstance(result, BaseException):
+                del waiting[other]
+                finish(other, TaskSkipped(f"No se ejecutó: la tarea {task_id} falló"))
+            else:
+                deps.discard(task_id)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="plan") as pool:
+        running = {}
+        while waiting or running:
+            busy = set().union(*(files[task_id] for task_id in running.values()))
+            for task_id in [t for t, deps in waiting.items() if not deps]:
+                if files[task_id] & busy:
+                    continue  # Another task is working on one of its files
+                busy |= files[task_id]
+                del waiting[task_id]
+                running[pool.submit(run, by_id[task_id])] = task_id
+            if not running:
+                raise ValueError(f"Tareas con dependencias sin resolver: {', '.join(waiting)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task_id = running.pop(future)
+                error = future.exception()
+                finish(task_id, error if error is not None else future.result())
+    return results
+
+
+_file_locks: Dict[str, threading.Lock] = {}
+_file_locks_guard = threading.Lock()
+
+
+def file_lock(path: str) -> threading.Lock:
+    """Process-wide lock of a file path, so concurrent tasks never interleave writes to it."""
+    key = os.path.normcase(os.path.abspath(path))
+    with _file_locks_guard:
+        lock = _file_locks.get(key)
+        if lock is None:
+            lock = _file_locks[key] = threading.Lock()
+        return lock
@@ -0,0 +1,207 @@
+# src/utils/tool_registry.py
+import functools
+import inspect
+import re
+import typing
+from typing import Any, Callable, Dict, Iterable, List, Literal, Optional, Union
+
+JSON_TYPES = {
+    str: "string",
+    int: "integer",
+    float: "number",
+    bool: "boolean",
+    list: "array",
+    dict: "object",
+    type(None): "null",
+}
+
+Validator = Callable[[Any, str], None]
+
+
+class ToolArgumentError(ValueError):
+    """Arguments sent by the model do not match the tool's signature."""
+
+
+def json_schema(annotation: Any) -> Dict[str, Any]:
+    """JSON schema of a type annotation (str, int, List[...], Dict[str, ...], Literal, Optional...)."""
+    if annotation is inspect.Parameter.empty:
+        return {"type": "string"}
+    if annotation is Any:
+        return {}
+    origin, args = typing.get_origin(annotation), typing.get_args(annotation)
+    if origin is Literal:
+        types = {JSON_TYPES.get(type(value), "string") for value in args}
+        schema = {"enum": list(args)}
+        if len(types) == 1:
+            schema["type"] = types.pop()
+        return schema
+    if origin is Union:
+        options = [json_schema(arg) for arg in args]
+        return options[0] if len(options) == 1 else {"anyOf": options}
+    if origin in (list, tuple, set, frozenset):
+        schema = {"type": "array"}
+        if args and args[-1] is not Ellipsis:
+            schema["items"] = json_schema(args[0])
+        return schema
+    if origin is dict:
+        schema = {"type": "object"}
+        if len(args) == 2:
+            schema["additionalProperties"] = json_schema(args[1])
+        return schema
+    return {"type": JSON_TYPES.get(annotation, "string")}
+
+
+def _check_type(expected: type, name: str) -> Validator:
+    def validate(value: Any, path: str):
+        # bool is an int in Python, but not in JSON schema
+        if isinstance(value, bool) and expected is not bool:
+            raise ToolArgumentError(f"{path}: se esperaba {name}, se recibió booleano")
+        if not isinstance(value, expected):
+            raise ToolArgumentError(f"{path}: se esperaba {name}, se recibió {type(value).__name__}")
+    return validate
+
+
+def compile_validator(annotation: Any) -> Validator:
+    """Builds, once, a function that checks a decoded JSON value against an annotation."""
+    if annotation is inspect.Parameter.empty or annotation is Any:
+        return lambda value, path: None
+    origin, args = typing.get_origin(annotation), typing.get_args(annotation)
+    if origin is Literal:
+        allowed = set(args)
+        choices = ", ".join(repr(arg) for arg in args)
+
+        def validate_literal(value: Any, path: str):
+            if value not in allowed:
+                raise ToolArgumentError(f"{path}: {value!r} no es uno de {choices}")
+        return validate_literal
+    if origin is Union:
+        options = [compile_validator(arg) for arg in args]
+
+        def validate_union(value: Any, path: str):
+            errors = []
+            for option in options:
+                try:
+                    return option(value, path)
+                except ToolArgumentError as e:
+                    errors.append(str(e))
+            raise ToolArgumentError(" / ".join(errors))
+        return validate_union
+    if origin in (list, tuple, set, frozenset):
+        check_list = _check_type(list, "array")
+        item = compile_validator(args[0]) if args and args[-1] is not Ellipsis else None
+
+        def validate_list(value: Any, path: str):
+            check_list(value, path)
+            if item is not None:
+                for i, element in enumerate(value):
+                    item(element, f"{path}[{i}]")
+        return validate_list
+    if origin is dict:
+        check_dict = _check_type(dict, "object")
+        item = compile_validator(args[1]) if len(args) == 2 else None
+
+        def validate_dict(value: Any, path: str):
+            check_dict(value, path)
+            if item is not None:
+                for key, element in value.items():
+                    item(element, f"{path}.{key}")
+        return validate_dict
+    if annotation is float:
+        return _check_type((int, float), "number")  # JSON has no int/float distinction
+    if annotation in JSON_TYPES:
+        return _check_type(annotation, JSON_TYPES[annotation])
+    return lambda value, path: None  # Types with no JSON counterpart are not checked
+
+
+def _parse_docstring(doc: str):
+    """Description and per-parameter notes ("Args:" section, Google style) of a docstring."""
+    doc = inspect.cleandoc(doc or "")
+    parts = re.split(r"^\s*(?:Args|Arguments|Parameters):\s*$", doc, maxsplit=1, flags=re.MULTILINE)
+    params = {}
+    if len(parts) == 2:
+        for match in re.finditer(r"^\s+(\w+)(?:\s*\([^)]*\))?:\s*(.+)$", parts[1], flags=re.MULTILINE):
+            params[match.group(1)] = match.group(2).strip()
+    return parts[0].strip(), params
+
+
+class ToolSpec:
+    """A tool function with its JSON schema and argument validators, computed once."""
+
+    def __init__(self, func: Callable):
+        self.func = func
+        self.name = func.__name__
+        self.is_async = inspect.iscoroutinefunction(func)
+        description, notes = _parse_docstring(func.__doc__)
+        hints = typing.get_type_hints(func)
+        signature = inspect.signature(func)
+
+        properties = {}
+        self.required: List[str] = []
+        self.validators: Dict[str, Validator] = {}
+        for param in signature.parameters.values():
+            annotation = hints.get(param.name, inspect.Parameter.empty)
+            properties[param.name] = json_schema(annotation)
+            if param.name in notes:
+                properties[param.name]["description"] = notes[param.name]
+            self.validators[param.name] = compile_validator(annotation)
+            if param.default is inspect.Parameter.empty:
+                self.required.append(param.name)
+
+        self.schema = {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": description,
+                "parameters": {
+                    "type": "object",
+                    "properties": properties,
+                    "required": self.required,
+                    "additionalProperties": False,
+                },
+            },
+        }
+
+    def validate(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Checks decoded arguments, raising ToolArgumentError with every problem found."""
+        if not isinstance(arguments, dict):
+            raise ToolArgumentError("los argumentos deben ser un objeto JSON")
+        problems = [f"falta el argumento '{name}'" for name in self.required if name not in arguments]
+        for name, value in arguments.items():
+            validator = self.validators.get(name)
+            if validator is None:
+                problems.append(f"argumento desconocido '{name}'")
+                continue
+            try:
+                validator(value, name)
+            except ToolArgumentError as e:
+                problems.append(str(e))
+        if problems:
+            raise ToolArgumentError("; ".join(problems))
+        return arguments
+
+
+@functools.lru_cache(maxsize=None)
+def tool_spec(func: Callable) -> ToolSpec:
+    """Cached ToolSpec of a function; schemas are built once per process."""
+    return ToolSpec(func)
+
+
+class ToolRegistry:
+    """The tools a provider exposes, by name, with their schemas ready to send."""
+
+    def __init__(self, funcs: Iterable[Callable] = ()):
+        self.specs: Dict[str, ToolSpec] = {}
+        for func in funcs:
+            spec = tool_spec(func)
+            self.specs[spec.name] = spec
+        self.schemas = [spec.schema for spec in self.specs.values()]
+        self.functions = {name: spec.func for name, spec in self.specs.items()}
+
+    def get(self, name: str) -> Optional[ToolSpec]:
+        return self.specs.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.specs
+
+    def __len__(self) -> int:
+        return len(self.specs)
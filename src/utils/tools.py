@@ -1,29 +1,100 @@
 # src/utils/tools.py
-from typing import List, Dict, Literal, Any
+from typing import List, Dict, Literal, Any, AsyncGenerator, Optional, Tuple
 import os
-import librosa
-import soundfile as sf
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
 from src.utils.printer import Printer
 
 printer = Printer(identifier="TOOLS")
 
+FILE_IO_WORKERS = min(32, (os.cpu_count() or 1) + 4)  # Threads doing blocking file I/O
+_file_io_executor = None
+
+
+def _file_io_pool() -> ThreadPoolExecutor:
+    global _file_io_executor
+    if _file_io_executor is None:
+        _file_io_executor = ThreadPoolExecutor(max_workers=FILE_IO_WORKERS, thread_name_prefix="file-io")
+    return _file_io_executor
+
+
+def _file_operation(op: Dict[str, str], action: str) -> Any:
+    """One read or write of batch_file_operations (blocking; runs in the file I/O pool)."""
+    try:
+        if action == "read":
+            with open(op["path"], "r") as f:
+                return {op["path"]: f.read()}
+        elif action == "write":
+            with open(op["path"], "w", encoding="utf-8") as f:
+                f.write(op["content"])
+            return f"Archivo {op['path']} actualizado"
+        return None
+    except Exception as e:
+        return f"Error en {op['path']}: {str(e)}"
+
+
+def _schedule_file_operations(operations: List[Dict[str, str]], action: str) -> List[asyncio.Task]:
+    """
+    Starts every operation on the file I/O pool; each task returns (index, result).
+    Different files run in parallel, but operations on the same path run one
+    after another in input order, so the last write to a file always wins.
+    """
+    loop = asyncio.get_running_loop()
+    pool = _file_io_pool()
+    last_by_path: Dict[str, asyncio.Task] = {}
+
+    async def run(index: int, op: Dict[str, str], after: Optional[asyncio.Task]):
+        if after is not None:
+            await asyncio.wait([after])  # Only the order matters, not how it ended
+        return index, await loop.run_in_executor(pool, _file_operation, op, action)
+
+    tasks = []
+    for i, op in enumerate(operations):
+        key = os.path.normcase(os.path.abspath(str(op.get("path", ""))))
+        task = asyncio.ensure_future(run(i, op, last_by_path.get(key)))
+        last_by_path[key] = task
+        tasks.append(task)
+    return tasks
+
+
+async def iter_file_operations(operations: List[Dict[str, str]], action: Literal["read", "write"]
+                               ) -> AsyncGenerator[Tuple[int, Any], None]:
+    """
+    Same as batch_file_operations, yielding (index in operations, result) for
+    each file as soon as it is done, in completion order.
+    """
+    pending = _schedule_file_operations(operations, action)
+    try:
+        for next_done in asyncio.as_completed(pending):
+            index, result = await next_done
+            if result is not None:
+                yield index, result
+    finally:
+        for task in pending:
+            task.cancel()  # The caller stopped early; files not started yet are skipped
+
+
 async def batch_file_operations(operations: List[Dict[str, str]], action: Literal["read", "write"]):
-    results = []
-    for op in operations:
-        try:
-            if action == "read":
-                with open(op["path"], "r") as f:
-                    results.append({op["path"]: f.read()})
-            elif action == "write":
-                with open(op["path"], "w", encoding="utf-8") as f:
-                    f.write(op["content"])
-                    results.append(f"Archivo {op['path']} actualizado")
-        except Exception as e:
-            results.append(f"Error en {op['path']}: {str(e)}")
-    return results
+    """
+    Reads or writes several files in one call.
+
+    Args:
+        operations: One object per file, with "path" (and "content" when writing).
+        action: "read" returns each file's content, "write" replaces it.
+    """
+    # Files are handled in parallel by a bounded thread pool, off the event loop
+    results = await asyncio.gather(*_schedule_file_operations(operations, action))
+    return [result for _, result in results if result is not None]
 
 async def directory_operations(path: str, action: Literal["list", "analyze"]):
+    """
+    Lists a directory or reports its files (size, modification time) and subdirectories.
+
+    Args:
+        path: Directory to inspect.
+        action: "list" returns the entry names, "analyze" the details.
+    """
     try:
         if action == "list":
             return {path: os.listdir(path)}
@@ -43,14 +114,29 @@ async def directory_operations(path: str, action: Literal["list", "analyze"]):
         return f"Error: {str(e)}"
 
 async def multi_modal_processing(files: List[str], operation: Literal["summarize", "translate"]):
+    """
+    Summarizes or translates the given files.
+
+    Args:
+        files: Paths of the files to process.
+        operation: "summarize" or "translate".
+    """
     # Placeholder for multi-modal processing
     pass
 
 async def analyze_audio(file_path: str) -> Dict[str, Any]:
     """
     Analyzes an audio file and returns a dictionary of features.
+
+    Args:
+        file_path: Path of the audio file (any format librosa can read).
     """
+    # librosa is CPU-bound; run it off the event loop so concurrent tool calls overlap
+    return await asyncio.to_thread(_analyze_audio_sync, file_path)
+
+def _analyze_audio_sync(file_path: str) -> Dict[str, Any]:
     try:
+        import librosa  # Heavy; only loaded when audio is actually analyzed
         y, sr = librosa.load(file_path)
         mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
         chroma = librosa.feature.chroma_stft(y=y, sr=sr)
@@ -0,0 +1,163 @@
+# src/utils/undo_journal.py
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+class BlobStore:
+    """
+    Content-addressed, reference-counted, zlib-compressed blobs. Identical
+    contents are stored once. Past memory_limit bytes (compressed), the least
+    recently used blobs are spilled to a temporary directory.
+    """
+
+    def __init__(self, memory_limit: int = 64 * 1024 * 1024):
+        self.memory_limit = memory_limit
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()  # digest -> compressed data, LRU order
+        self._memory_bytes = 0
+        self._refs: Dict[str, int] = {}
+        self._spill_dir: Optional[str] = None
+        self._cleanup = None
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in self._refs:
+            self._refs[digest] += 1
+            return digest
+        self._refs[digest] = 1
+        self._keep(digest, zlib.compress(data, 6))
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        compressed = self._memory.get(digest)
+        if compressed is not None:
+            self._memory.move_to_end(digest)
+        else:
+            path = self._spill_path(digest)
+            with open(path, "rb") as f:
+                compressed = f.read()
+            os.remove(path)
+            self._keep(digest, compressed)  # Likely to be needed again (the next undo level)
+        return zlib.decompress(compressed)
+
+    def release(self, digest: str):
+        self._refs[digest] -= 1
+        if self._refs[digest]:
+            return
+        del self._refs[digest]
+        compressed = self._memory.pop(digest, None)
+        if compressed is not None:
+            self._memory_bytes -= len(compressed)
+        elif self._spill_dir is not None:
+            try:
+                os.remove(self._spill_path(digest))
+            except FileNotFoundError:
+                pass
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._memory_bytes
+
+    def _keep(self, digest: str, compressed: bytes):
+        self._memory[digest] = compressed
+        self._memory_bytes += len(compressed)
+        while self._memory_bytes > self.memory_limit and len(self._memory) > 1:
+            old_digest, old = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old)
+            with open(self._spill_path(old_digest), "wb") as f:
+                f.write(old)
+
+    def _spill_path(self, digest: str) -> str:
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix="undo-journal-")
+            self._cleanup = weakref.finalize(self, shutil.rmtree, self._spill_dir, True)
+        return os.path.join(self._spill_dir, digest)
+
+    def close(self):
+        self._memory.clear()
+        self._memory_bytes = 0
+        self._refs.clear()
+        if self._cleanup is not None:
+            self._cleanup()
+            self._spill_dir = None
+            self._cleanup = None
+
+
+class UndoJournal:
+    """
+    Multi-level undo of file edits. record(path) is called before each edit
+    and saves the file's current contents (or that it did not exist); undo(path)
+    restores the most recent saved state. Up to max_levels states are kept
+    per file, as deduplicated blobs in a BlobStore.
+    """
+
+    def __init__(self, max_levels: int = 50, memory_limit: int = 64 * 1024 * 1024):
+        self.max_levels = max_levels
+        self.blobs = BlobStore(memory_limit)
+        self._stacks: Dict[str, List[Optional[str]]] = {}  # path -> blob digests (None: file absent), oldest first
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.abspath(path)
+
+    def record(self, path: str):
+        """
+        Saves the current state of a file before it is modified or deleted.
+        A state equal to the last one saved is not saved again, so undo never
+        "restores" the contents the file already has.
+        """
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = None
+        with self._lock:
+            stack = self._stacks.setdefault(self._key(path), [])
+            digest = hashlib.sha256(data).hexdigest() if data is not None else None
+            if stack and stack[-1] == digest:
+                return
+            stack.append(self.blobs.put(data) if data is not None else None)
+            if len(stack) > self.max_levels:
+                oldest = stack.pop(0)
+                if oldest is not None:
+                    self.blobs.release(oldest)
+
+    def undo(self, path: str) -> bool:
+        """Restores the last recorded state of a file; False if there is none."""
+        with self._lock:
+            stack = self._stacks.get(self._key(path))
+            if not stack:
+                return False
+            digest = stack[-1]
+            data = self.blobs.get(digest) if digest is not None else None
+            if data is None:
+                if os.path.exists(path):
+                    os.remove(path)  # The file did not exist before the edit
+            else:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(data)
+            stack.pop()  # Only once restored: a failed write leaves the level in place
+            if digest is not None:
+                self.blobs.release(digest)
+            if not stack:
+                del self._stacks[self._key(path)]
+            return True
+
+    def levels(self, path: str) -> int:
+        return len(self._stacks.get(self._key(path), ()))
+
+    def __contains__(self, path: str) -> bool:
+        return self.levels(path) > 0
+
+    def close(self):
+        with self._lock:
+            self._stacks.clear()
+            self.blobs.close()
@@ -0,0 +1,8 @@
+# tests/conftest.py
+import os
+import sys
+
+# The entry points and src/ are imported from the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
@@ -0,0 +1,30 @@
+# tests/test_context.py
+from src.utils.context import SUMMARY_PREFIX, ContextWindow, extractive_summary, message_tokens
+
+
+def _history(turns: int, chars: int = 400):
+    messages = [{"role": "system", "content": "Eres un asistente."}]
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"pregunta {i} " + "x" * chars})
+        messages.append({"role": "assistant", "content": f"respuesta {i} " + "y" * chars})
+    return messages
+
+
+def test_compacted_history_with_summary_fits_budget():
+    window = ContextWindow(budget=1200, reserve_tokens=0, keep_recent=2, summarizer=extractive_summary)
+    result = window.compact(_history(12), "gpt-4")
+    assert sum(message_tokens(m) for m in result) <= 1200
+    assert result[1]["content"].startswith(SUMMARY_PREFIX)
+    assert result[-1]["content"].startswith("respuesta 11")
+
+
+def test_previous_summary_is_counted_again():
+    window = ContextWindow(budget=1200, reserve_tokens=0, keep_recent=2, summarizer=extractive_summary)
+    history = window.compact(_history(12), "gpt-4")
+    for i in range(12, 16):
+        history += [{"role": "user", "content": f"pregunta {i} " + "x" * 400},
+                    {"role": "assistant", "content": f"respuesta {i} " + "y" * 400}]
+        history = window.compact(history, "gpt-4")
+        assert sum(message_tokens(m) for m in history) <= 1200
+    summaries = [m for m in history if m["content"].startswith(SUMMARY_PREFIX)]
+    assert len(summaries) == 1 and window.summary in summaries[0]["content"]
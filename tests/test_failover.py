@@ -0,0 +1,50 @@
+# tests/test_failover.py
+import importlib.util
+import os
+
+import pytest
+
+from conftest import ROOT
+from src.utils.circuit_breaker import CircuitBreaker
+
+
+@pytest.fixture(scope="module")
+def main2():
+    spec = importlib.util.spec_from_file_location("main2", os.path.join(ROOT, "main2.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class _Down:
+    is_llm = True
+    client = object()
+
+    def generate_response(self, prompt):
+        raise RuntimeError("down")
+
+
+class _Local:
+    is_llm = False  # Like GeminiProvider: answers with the local command interpreter
+
+    def generate_response(self, prompt):
+        return {"content": [{"text": "Comando no reconocido."}]}
+
+
+def _editor(main2, providers):
+    editor = main2.MultiAIEditor.__new__(main2.MultiAIEditor)
+    editor.providers = providers
+    editor.breakers = {name: CircuitBreaker(name) for name in providers}
+    return editor
+
+
+def test_developer_requests_never_fail_over_to_gemini(main2):
+    editor = _editor(main2, {"openai": _Down(), "gemini": _Local()})
+    assert [name for name, _ in editor._failover_chain("openai")] == ["openai"]
+    with pytest.raises(RuntimeError, match="down"):
+        editor._generate("openai", "escribe el código")
+
+
+def test_local_provider_still_answers_when_asked_directly(main2):
+    editor = _editor(main2, {"gemini": _Local()})
+    assert editor._generate("gemini", "analiza el proyecto")["content"][0]["text"] == "Comando no reconocido."
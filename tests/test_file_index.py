@@ -0,0 +1,43 @@
+# tests/test_file_index.py
+import importlib.util
+import os
+
+import pytest
+
+from conftest import ROOT
+from src.utils.file_index import FileIndex
+
+
+def _make_tree(root):
+    for path in ("requerimientos.md", "src/api.py", "src/models/user.py"):
+        full = os.path.join(root, path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, "w") as f:
+            f.write("x\n")
+
+
+def test_files_match_os_walk(tmp_path):
+    _make_tree(tmp_path)
+    index = FileIndex(str(tmp_path))
+    index.refresh()
+    expected = sorted(os.path.relpath(os.path.join(d, n), tmp_path) for d, _, names in os.walk(tmp_path) for n in names)
+    assert sorted(index.files()) == expected
+
+    (tmp_path / "src" / "new.py").write_text("y\n")
+    assert index.refresh()
+    assert os.path.join("src", "new.py") in index.files()
+
+
+@pytest.mark.parametrize("script", ["tool.py", "code-agent.py"])
+def test_deepseek_list_files_returns_relative_paths(script, tmp_path):
+    """_analyze_project_completion matches requirement keywords against this list."""
+    pytest.importorskip("gradio_client")
+    spec = importlib.util.spec_from_file_location(script[:-3].replace("-", "_"), os.path.join(ROOT, script))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    _make_tree(tmp_path)
+    agent = module.DeepSeekAgent.__new__(module.DeepSeekAgent)  # No client: only the file helpers are used
+    files = agent._list_files(str(tmp_path), format_output=False)
+    assert isinstance(files, list)
+    assert sorted(files) == sorted(["requerimientos.md", os.path.join("src", "api.py"),
+                                    os.path.join("src", "models", "user.py")])
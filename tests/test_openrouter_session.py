@@ -0,0 +1,40 @@
+# tests/test_openrouter_session.py
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from src.ai import OpenAIRouterProvider
+
+
+def _provider():
+    return OpenAIRouterProvider("openai/gpt-4o", "key", "", "")
+
+
+def test_session_from_finished_loop_is_closed():
+    provider = _provider()
+    first = asyncio.run(provider._get_session())
+    second = asyncio.run(provider._get_session())
+    assert first is not second
+    assert first.closed and not second.closed
+    asyncio.run(provider.close())
+    assert second.closed
+
+
+def test_session_of_running_loop_is_closed_there():
+    provider = _provider()
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        first = asyncio.run_coroutine_threadsafe(provider._get_session(), loop).result(5)
+        second = asyncio.run(provider._get_session())
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0.1), loop).result(5)  # Let the close run
+        assert first.closed and not second.closed
+        asyncio.run(provider.close())
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        loop.close()
@@ -0,0 +1,34 @@
+# tests/test_provider_imports.py
+import sys
+
+import pytest
+
+from src.ai import ProviderImports
+
+
+def test_is_available_does_not_import():
+    imports = ProviderImports()
+    imports.targets = {"colorsys": ("colorsys", None), "missing": ("no_such_sdk_module", None),
+                       "nested": ("no_such_sdk_module.client", "Client")}
+    assert "colorsys" not in sys.modules
+    assert imports.is_available("colorsys")
+    assert "colorsys" not in sys.modules
+    assert not imports.is_available("missing")
+    assert not imports.is_available("nested")  # Parent package missing
+
+
+def test_require_raises_for_missing_sdk():
+    imports = ProviderImports()
+    imports.targets = {"missing": ("no_such_sdk_module", None), "old": ("json", "NoSuchClient")}
+    with pytest.raises(ImportError, match="pip install"):
+        imports.require("missing", "SDK no instalado. Ejecute: pip install x")
+    with pytest.raises(ImportError, match="no compatible"):
+        imports.require("old", "SDK no instalado")
+    assert not imports.is_available("old")  # Known after the load attempt
+
+
+def test_mistral_entry_found_when_installed():
+    pytest.importorskip("mistralai")
+    imports = ProviderImports()
+    assert imports.is_available("async_mistralai")
+    assert imports.require("async_mistralai", "Mistral no instalado").__name__ == "Mistral"
@@ -0,0 +1,60 @@
+# tests/test_session_store.py
+from src.utils.context import is_turn_start
+from src.utils.session_store import INTERRUPTED_TOOL_RESULT, SessionStore, open_history
+
+
+def _store(tmp_path):
+    return SessionStore(str(tmp_path / "sessions.db"))
+
+
+def test_resume_loads_the_tail_from_a_turn_start(tmp_path):
+    store = _store(tmp_path)
+    history = open_history(store, "claude")
+    for i in range(5):
+        history.append({"role": "user", "content": f"pregunta {i}"})
+        history.append({"role": "assistant", "content": f"respuesta {i}"})
+
+    resumed = open_history(store, "claude", resume=True, tail=3, turn_start=is_turn_start)
+
+    assert resumed.session_id == history.session_id
+    assert list(resumed) == [{"role": "user", "content": "pregunta 4"}, {"role": "assistant", "content": "respuesta 4"}]
+
+
+def test_resume_closes_a_tool_use_left_without_result(tmp_path):
+    store = _store(tmp_path)
+    history = open_history(store, "claude")
+    history.append({"role": "user", "content": [{"type": "text", "text": "edita app.py"}]})
+    history.append({"role": "assistant", "content": [
+        {"type": "tool_use", "id": "toolu_1", "name": "str_replace_editor", "input": {"command": "view"}},
+        {"type": "tool_use", "id": "toolu_2", "name": "str_replace_editor", "input": {"command": "view"}},
+    ]})
+    history.append({"role": "user", "content": [{"type": "tool_result", "tool_use_id": "toolu_1", "content": "ok"}]})
+    # The process stopped here, before the result of toolu_2
+
+    resumed = open_history(store, "claude", resume=True, turn_start=is_turn_start)
+
+    assert resumed[-1] == {"role": "user", "content": [
+        {"type": "tool_result", "tool_use_id": "toolu_2", "content": INTERRUPTED_TOOL_RESULT, "is_error": True}]}
+    assert store.load(history.session_id)[-1] == resumed[-1]  # The log is closed as well
+    assert len(open_history(store, "claude", resume=True, turn_start=is_turn_start)) == len(resumed)
+
+
+def test_resume_closes_openai_tool_calls(tmp_path):
+    store = _store(tmp_path)
+    history = open_history(store, "openai")
+    history.append({"role": "user", "content": "lee app.py"})
+    history.append({"role": "assistant", "content": "", "tool_calls": [
+        {"id": "call_1", "type": "function", "function": {"name": "batch_file_operations", "arguments": "{}"}}]})
+
+    resumed = open_history(store, "openai", resume=True)
+
+    assert resumed[-1] == {"role": "tool", "tool_call_id": "call_1", "content": INTERRUPTED_TOOL_RESULT}
+
+
+def test_complete_history_is_left_unchanged(tmp_path):
+    store = _store(tmp_path)
+    history = open_history(store, "claude")
+    history.append({"role": "user", "content": "hola"})
+    history.append({"role": "assistant", "content": [{"type": "text", "text": "hola"}]})
+
+    assert list(open_history(store, "claude", resume=True)) == list(history)
@@ -0,0 +1,32 @@
+# tests/test_smoke.py
+"""The entry points compile, and import when their SDKs are installed."""
+import importlib.util
+import os
+import py_compile
+
+import pytest
+
+from conftest import ROOT
+
+# Script -> SDK it needs at import time (None: imports without one)
+ENTRY_POINTS = {
+    "main.py": "anthropic",
+    "main2.py": None,
+    "tool.py": "gradio_client",
+    "code-agent.py": "gradio_client",
+}
+
+
+@pytest.mark.parametrize("script", sorted(ENTRY_POINTS))
+def test_entry_point_compiles(script):
+    py_compile.compile(os.path.join(ROOT, script), doraise=True)
+
+
+@pytest.mark.parametrize("script", sorted(ENTRY_POINTS))
+def test_entry_point_imports(script):
+    if ENTRY_POINTS[script]:
+        pytest.importorskip(ENTRY_POINTS[script])
+    name = os.path.splitext(script)[0].replace("-", "_")
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, script))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
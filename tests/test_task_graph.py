@@ -0,0 +1,58 @@
+# tests/test_task_graph.py
+import threading
+import time
+
+from src.utils.task_graph import PlanTask, TaskSkipped, parse_plan, run_graph
+
+
+def _append_line(path, line):
+    """Read-modify-write of a whole file, slow enough to lose updates if two run at once."""
+    def run(task):
+        with open(path) as f:
+            content = f.read()
+        time.sleep(0.05)
+        with open(path, "w") as f:
+            f.write(content + line + "\n")
+        return task.id
+    return run
+
+
+def test_tasks_sharing_a_file_keep_both_edits(tmp_path):
+    target = tmp_path / "app.py"
+    target.write_text("base\n")
+    tasks = [PlanTask(id="t1", description="a", files=[str(target)]),
+             PlanTask(id="t2", description="b", files=[str(tmp_path / "." / "app.py")])]
+    lines = {"t1": "uno", "t2": "dos"}
+
+    results = run_graph(tasks, lambda task: _append_line(str(target), lines[task.id])(task), max_workers=4)
+
+    assert results == {"t1": "t1", "t2": "t2"}
+    assert target.read_text() == "base\nuno\ndos\n"  # Plan order, neither edit lost
+
+
+def test_tasks_on_different_files_run_in_parallel():
+    started, both = [], threading.Event()
+
+    def run(task):
+        started.append(task.id)
+        if len(started) == 2:
+            both.set()
+        assert both.wait(2), "the tasks did not overlap"
+        return task.id
+
+    tasks = [PlanTask(id="t1", description="a", files=["a.py"]), PlanTask(id="t2", description="b", files=["b.py"])]
+    assert run_graph(tasks, run, max_workers=2) == {"t1": "t1", "t2": "t2"}
+
+
+def test_failed_dependency_skips_dependents():
+    def run(task):
+        if task.id == "t1":
+            raise RuntimeError("boom")
+        return task.id
+
+    tasks = parse_plan('```json\n[{"id": "t1", "description": "a"}, {"id": "t2", "description": "b", "depends_on": ["t1"]},'
+                       ' {"id": "t3", "description": "c"}]\n```')
+    results = run_graph(tasks, run)
+    assert isinstance(results["t1"], RuntimeError)
+    assert isinstance(results["t2"], TaskSkipped)
+    assert results["t3"] == "t3"